@@ -0,0 +1,179 @@
+# backend/insights_cache.py
+
+import asyncio
+import gzip
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Set
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+
+# -----------------------------
+# Snapshot of the insights sheet
+# -----------------------------
+@dataclass
+class Snapshot:
+    data: Any
+    body: bytes          # pre-encoded JSON response body
+    etag: str            # quoted content hash of body
+    last_modified: float # wall-clock time the content last changed
+    fetched_at: float = 0.0  # time.monotonic() when the upstream fetch finished
+    compressed: Dict[str, bytes] = field(default_factory=dict)  # content-coding -> body
+    derived: Dict[str, Any] = field(default_factory=dict)       # per-version indexes etc.
+
+    @property
+    def version(self):
+        return self.etag.strip('"')
+
+    def age(self):
+        return time.monotonic() - self.fetched_at
+
+
+def build_snapshot(data, body, previous: Optional[Snapshot] = None, derive=None):
+    """Hash and compress a freshly encoded body once, so requests only pick a buffer."""
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    if previous is not None and previous.etag == etag:
+        # Content unchanged: keep the old version (and its compressed buffers)
+        return Snapshot(data=previous.data, body=previous.body, etag=etag,
+                        last_modified=previous.last_modified, compressed=previous.compressed,
+                        derived=previous.derived)
+    compressed = {"gzip": gzip.compress(body, compresslevel=6)}
+    if brotli is not None:
+        compressed["br"] = brotli.compress(body, quality=5)
+    snapshot = Snapshot(data=data, body=body, etag=etag, last_modified=time.time(), compressed=compressed)
+    if derive is not None:
+        snapshot.derived = derive(snapshot, previous)
+    return snapshot
+
+
+# -----------------------------
+# TTL cache with stale-while-revalidate
+# -----------------------------
+class InsightsCache:
+    """In-process snapshot of the insights sheet.
+
+    - Fresh (age < ttl): served directly.
+    - Stale (ttl <= age < max_stale): served directly, a refresh runs in the background.
+    - Expired / empty: the caller waits for a refresh. Concurrent misses share one fetch.
+    If a refresh fails and any snapshot exists, the old snapshot keeps being served.
+    """
+
+    def __init__(self, loader: Callable[[], Any], encode: Callable[[Any], bytes],
+                 ttl=60.0, max_stale=600.0, refresh_interval=None, executor=None, derive=None):
+        self._loader = loader
+        self._encode = encode
+        self._derive = derive      # (snapshot, previous) -> dict of per-version structures (built off-loop)
+        self._executor = executor  # blocking upstream I/O runs here (None = loop default)
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refresh_interval = refresh_interval or max(ttl / 2, 1.0)
+        self._snapshot: Optional[Snapshot] = None
+        self._inflight: Optional[asyncio.Future] = None
+        self._refresher: Optional[asyncio.Task] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    async def get(self):
+        snap = self._snapshot
+        if snap is not None:
+            age = snap.age()
+            if age < self.ttl:
+                return snap
+            if age < self.max_stale:
+                self._revalidate()
+                return snap
+        try:
+            return await self.refresh()
+        except Exception:
+            if snap is not None:
+                return snap
+            raise
+
+    async def refresh(self):
+        """Fetch upstream, collapsing concurrent callers into a single request."""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+        return await asyncio.shield(self._inflight)
+
+    async def reload(self):
+        """Like refresh(), but never joins a fetch that started before this call."""
+        if self._inflight is not None:
+            try:
+                await asyncio.shield(self._inflight)
+            except Exception:
+                pass
+        return await self.refresh()
+
+    async def _fetch(self):
+        try:
+            loop = asyncio.get_running_loop()
+            snapshot = await loop.run_in_executor(self._executor, self._load, self._snapshot)
+            snapshot.fetched_at = time.monotonic()
+            previous, self._snapshot = self._snapshot, snapshot
+            if previous is None or previous.etag != snapshot.etag:
+                self._publish(snapshot)
+            return snapshot
+        finally:
+            self._inflight = None
+
+    def _load(self, previous):
+        data = self._loader()
+        return build_snapshot(data, self._encode(data), previous, self._derive)
+
+    def _revalidate(self):
+        if self._inflight is not None:
+            return
+        task = asyncio.ensure_future(self.refresh())
+        # Background revalidation errors are swallowed; the stale snapshot stays in place
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    # -----------------------------
+    # Change notifications
+    # -----------------------------
+    def subscribe(self, maxsize=8):
+        """Return a queue that receives every new snapshot version."""
+        queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _publish(self, snapshot):
+        for queue in list(self._subscribers):
+            if queue.full():
+                # Slow consumer: drop its oldest pending version, it only needs the latest
+                queue.get_nowait()
+            queue.put_nowait(snapshot)
+
+    # -----------------------------
+    # Background refresher
+    # -----------------------------
+    def start(self):
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.ensure_future(self._refresh_loop())
+
+    async def stop(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            try:
+                await self._refresher
+            except asyncio.CancelledError:
+                pass
+            self._refresher = None
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Background insights refresh failed: {e}")
+            await asyncio.sleep(self.refresh_interval)
@@ -0,0 +1,21 @@
+# backend/insights_diff.py
+
+from backend.insights_model import Insights
+
+
+# -----------------------------
+# Section-level diff between two insight documents
+# -----------------------------
+def _sections(insights):
+    if insights is None:
+        return {}
+    if isinstance(insights, Insights):
+        return insights.model_dump(mode="json")
+    return dict(insights)
+
+def diff_sections(old, new):
+    """Return {"changed": {section: new_value}, "removed": [section, ...]} at top-level granularity."""
+    before, after = _sections(old), _sections(new)
+    changed = {key: value for key, value in after.items() if before.get(key) != value}
+    removed = [key for key in before if key not in after]
+    return {"changed": changed, "removed": removed}
@@ -0,0 +1,112 @@
+# backend/insights_index.py
+
+import base64
+
+from backend.insights_model import Insights
+
+
+# -----------------------------
+# Section keys served by the query API
+# -----------------------------
+MARKETING_SECTIONS = ["campaign_themes", "keywords", "Marketing_campaign", "pain_points", "market_gaps"]
+RECOMMENDATION_SECTIONS = ["product_manager"] + MARKETING_SECTIONS
+COMPETITOR_FIELDS = ["competitor", "strengths", "weaknesses"]
+
+MAX_PAGE_SIZE = 100
+
+
+class CursorError(ValueError):
+    """Raised for malformed cursors or cursors issued for an older snapshot."""
+
+
+def _key(name):
+    return " ".join(str(name).lower().split())
+
+
+# -----------------------------
+# Per-snapshot indexes
+# -----------------------------
+class InsightIndex:
+    """Lookup tables built once per snapshot so queries never scan the whole document."""
+
+    def __init__(self, insights: Insights, version: str):
+        self.version = version
+        self.competitors = []
+        self.by_competitor = {}
+        self.sections = {}
+        self.regulatory = {}
+        if insights is None:
+            return
+
+        for comp in insights.competitor_insights:
+            doc = comp.model_dump(mode="json")
+            self.competitors.append(doc)
+            self.by_competitor.setdefault(_key(doc["competitor"]), doc)
+
+        self.sections["product_manager"] = list(insights.recommendations_for_product_manager)
+        marketing = insights.recommendations_for_marketing_team.model_dump(mode="json")
+        for key in MARKETING_SECTIONS:
+            self.sections[key] = list(marketing.get(key) or [])
+        self._section_keys = {_key(k): k for k in self.sections}
+
+        for note_type, note in insights.regulatory_notes.model_dump(mode="json").items():
+            self.regulatory[_key(note_type)] = {"type": note_type, "note": note}
+
+    def competitor(self, name):
+        return self.by_competitor.get(_key(name))
+
+    def section(self, name):
+        key = self._section_keys.get(_key(name)) if self.sections else None
+        return key, (self.sections.get(key) if key else None)
+
+    def regulatory_notes(self, note_type=None):
+        if note_type is None:
+            return list(self.regulatory.values())
+        note = self.regulatory.get(_key(note_type))
+        return [note] if note else []
+
+
+# -----------------------------
+# Projection and cursor pagination
+# -----------------------------
+def project(doc, fields):
+    if not fields:
+        return doc
+    return {f: doc[f] for f in fields if f in doc}
+
+def parse_fields(raw, allowed):
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(allowed)}")
+    return fields
+
+def _encode_cursor(version, offset):
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+def _decode_cursor(cursor, version):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_version, _, offset = base64.urlsafe_b64decode(padded).decode().rpartition(":")
+        offset = int(offset)
+    except (ValueError, UnicodeDecodeError):
+        raise CursorError("Malformed cursor.")
+    if offset < 0:
+        raise CursorError("Malformed cursor.")
+    if cursor_version != version:
+        raise CursorError("Cursor belongs to an older insights version; restart without a cursor.")
+    return offset
+
+def paginate(items, version, cursor=None, limit=20):
+    """Slice `items` into a page; the cursor pins the snapshot version it was issued for."""
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    offset = _decode_cursor(cursor, version) if cursor else 0
+    page = items[offset:offset + limit]
+    end = offset + len(page)
+    return {
+        "items": page,
+        "total": len(items),
+        "next_cursor": _encode_cursor(version, end) if end < len(items) else None,
+    }
@@ -0,0 +1,165 @@
+# backend/insights_model.py
+
+import json
+from typing import Any, Dict, List, Optional
+
+import orjson
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+# -----------------------------
+# Typed insight document (mirrors the prompt in llm_generate_insights.py)
+# -----------------------------
+def _as_list(value):
+    """LLM output is loose: accept a single string, null or a list of strings."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, list):
+        return [v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for v in value]
+    return [str(value)]
+
+def _as_text(value):
+    if value is None:
+        return ""
+    if isinstance(value, list):
+        return " ".join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return str(value)
+
+
+class _Loose(BaseModel):
+    model_config = ConfigDict(extra="allow", populate_by_name=True)
+
+
+class CompetitorInsight(_Loose):
+    competitor: str = ""
+    strengths: List[str] = Field(default_factory=list)
+    weaknesses: List[str] = Field(default_factory=list)
+
+    @field_validator("strengths", "weaknesses", mode="before")
+    @classmethod
+    def coerce_lists(cls, value):
+        return _as_list(value)
+
+    @field_validator("competitor", mode="before")
+    @classmethod
+    def coerce_text(cls, value):
+        return _as_text(value)
+
+
+class MarketingRecommendations(_Loose):
+    campaign_themes: List[str] = Field(default_factory=list)
+    keywords: List[str] = Field(default_factory=list)
+    Marketing_campaign: List[str] = Field(default_factory=list)
+    pain_points: List[str] = Field(default_factory=list)
+    market_gaps: List[str] = Field(default_factory=list)
+
+    @field_validator(
+        "campaign_themes", "keywords", "Marketing_campaign", "pain_points", "market_gaps", mode="before"
+    )
+    @classmethod
+    def coerce_lists(cls, value):
+        return _as_list(value)
+
+
+class RegulatoryNotes(_Loose):
+    FDA: str = ""
+    recalls: str = ""
+    approvals: str = ""
+    regulations: str = ""
+
+    @field_validator("FDA", "recalls", "approvals", "regulations", mode="before")
+    @classmethod
+    def coerce_text(cls, value):
+        return _as_text(value)
+
+
+class Insights(_Loose):
+    executive_summary: str = ""
+    competitor_insights: List[CompetitorInsight] = Field(default_factory=list)
+    recommendations_for_product_manager: List[str] = Field(default_factory=list)
+    recommendations_for_marketing_team: MarketingRecommendations = Field(default_factory=MarketingRecommendations)
+    regulatory_notes: RegulatoryNotes = Field(default_factory=RegulatoryNotes)
+
+    @field_validator("executive_summary", mode="before")
+    @classmethod
+    def coerce_text(cls, value):
+        return _as_text(value)
+
+    @field_validator("recommendations_for_product_manager", mode="before")
+    @classmethod
+    def coerce_lists(cls, value):
+        return _as_list(value)
+
+    @field_validator("competitor_insights", mode="before")
+    @classmethod
+    def coerce_competitors(cls, value):
+        if isinstance(value, dict):
+            return [value]
+        return value or []
+
+    @field_validator("recommendations_for_marketing_team", "regulatory_notes", mode="before")
+    @classmethod
+    def coerce_sections(cls, value):
+        return value or {}
+
+
+# -----------------------------
+# Sheet rows -> Insights
+# -----------------------------
+def _strip_fences(text):
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.replace("```json", "").replace("```", "").strip()
+    return cleaned
+
+def _decode_cell(value):
+    """Cells written by the LLM scripts may hold JSON strings; decode them when possible."""
+    if isinstance(value, str):
+        cleaned = _strip_fences(value)
+        if cleaned[:1] in ("{", "["):
+            try:
+                return json.loads(cleaned)
+            except json.JSONDecodeError:
+                pass
+    return value
+
+def _normalize_keys(doc: Dict[str, Any]):
+    """Map the older key spellings used by llm_enrich_and_aggregate.py onto the canonical schema."""
+    normalized = {}
+    for key, value in doc.items():
+        lowered = key.lower().replace(" ", "_")
+        if lowered.startswith("recommendations_for_marketing"):
+            key = "recommendations_for_marketing_team"
+        elif lowered.startswith("recommendations_for") and "product_manager" in lowered:
+            key = "recommendations_for_product_manager"
+        normalized[key] = _decode_cell(value)
+    return normalized
+
+def parse_insight_rows(rows: List[Dict[str, Any]]) -> Optional[Insights]:
+    """Parse the rows of the llm_insights sheet into a validated Insights document.
+
+    Handles both layouts: a single `insights_raw` JSON cell (llm_generate_insights.py)
+    and one column per top-level key (llm_enrich_and_aggregate.py).
+    """
+    if not rows:
+        return None
+    return parse_insight_document(rows[0])
+
+def parse_insight_document(doc: Dict[str, Any]) -> Insights:
+    """Validate one insight object (a sheet row or a record from insights_history)."""
+    if "insights_raw" in doc:
+        raw = _decode_cell(doc["insights_raw"])
+        doc = raw if isinstance(raw, dict) else {"executive_summary": _strip_fences(str(raw))}
+    return Insights.model_validate(_normalize_keys(doc))
+
+
+# -----------------------------
+# Serialization
+# -----------------------------
+def encode_insights(insights: Optional[Insights]) -> bytes:
+    """Serialize once per snapshot; requests send these bytes as-is."""
+    if insights is None:
+        return orjson.dumps({"message": "No insights found in sheet."})
+    return orjson.dumps(insights.model_dump(mode="json"))
@@ -1,41 +1,150 @@
 # backend/main.py
 
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import hmac
 import os
-import json
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
 from dotenv import load_dotenv
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-import gspread
-from google.oauth2.service_account import Credentials
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+import orjson
+
+from backend.insights_cache import InsightsCache
+from backend.insights_diff import diff_sections
+from backend.insights_index import (
+    COMPETITOR_FIELDS, RECOMMENDATION_SECTIONS, CursorError, InsightIndex, paginate, parse_fields, project,
+)
+from backend.insights_model import encode_insights, parse_insight_document, parse_insight_rows
+from backend.responses import snapshot_response
+from insights_history import InsightHistory, content_hash
 
 # -----------------------------
 # Load environment variables
 # -----------------------------
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise Exception("OPENAI_API_KEY not found in .env")
-print("OPENAI_API_KEY found: True")
 
 # -----------------------------
-# Google Sheets scopes and auth
+# Google Sheets access
+# -----------------------------
+# sheets_helper authorizes lazily on first use, shares one session and caches
+# worksheet handles / spreadsheet keys, so refreshes skip the Drive title search.
+import sheets_helper
+
+# -----------------------------
+# Google Sheets info
+# -----------------------------
+INSIGHTS_SHEET = "llm_insights"
+
+# -----------------------------
+# Insights cache settings (seconds)
+# -----------------------------
+INSIGHTS_CACHE_TTL = float(os.getenv("INSIGHTS_CACHE_TTL", "60"))
+INSIGHTS_MAX_STALE = float(os.getenv("INSIGHTS_MAX_STALE", "900"))
+INSIGHTS_REFRESH_INTERVAL = float(os.getenv("INSIGHTS_REFRESH_INTERVAL", "30"))
+STREAM_HEARTBEAT = float(os.getenv("INSIGHTS_STREAM_HEARTBEAT", "15"))
+
+# Shared secret for refresh and rollback; those routes are refused while it is unset
+INSIGHTS_REFRESH_TOKEN = os.getenv("INSIGHTS_REFRESH_TOKEN")
+
+# Sheets calls get their own small pool so a slow Google call cannot starve other routes
+SHEETS_MAX_WORKERS = int(os.getenv("SHEETS_MAX_WORKERS", "4"))
+sheets_executor = ThreadPoolExecutor(max_workers=SHEETS_MAX_WORKERS, thread_name_prefix="sheets")
+
+# -----------------------------
+# Versioned history (local append-only store)
+# -----------------------------
+insights_history = InsightHistory()
+# A pinned version (insights_history.pin) is served instead of the live sheet (rollback);
+# the pin is stored beside the history, so it survives restarts and all workers share it
+
+# -----------------------------
+# Helper function to fetch insights
 # -----------------------------
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
+def fetch_insights():
+    """Read and validate the insights sheet. Raises on upstream errors so they are never cached."""
+    pinned = insights_history.pinned_version()
+    if pinned is not None:
+        record = insights_history.get(pinned)
+        return parse_insight_document(record["insights"])
+    try:
+        rows = sheets_helper.open_ws(INSIGHTS_SHEET).get_all_records()
+    except Exception as e:
+        if sheets_helper.is_not_found(e):
+            # The cached handle points at a deleted/replaced spreadsheet; resolve it again next time
+            sheets_helper.invalidate(INSIGHTS_SHEET)
+        raise
+    return parse_insight_rows(rows)
+
+def _sse(event, payload, event_id=None):
+    lines = f"id: {event_id}\n" if event_id else ""
+    return (lines + f"event: {event}\n").encode() + b"data: " + orjson.dumps(payload) + b"\n\n"
+
+def _is_version(data, version):
+    record = insights_history.get(version)
+    return record is not None and record["content_hash"] == content_hash(data.model_dump(mode="json"))
+
+def build_derived(snapshot, previous):
+    """Per-version structures: history sequence number, query indexes and the stream change event."""
+    pinned = insights_history.pinned_version()
+    if snapshot.data is not None and pinned is not None and _is_version(snapshot.data, pinned):
+        seq = pinned  # serving an old version is not a new one
+    elif snapshot.data is not None:
+        seq = insights_history.append(snapshot.data.model_dump(mode="json"), source="backend")
+    else:
+        seq = insights_history.latest_version()
+    diff = diff_sections(previous.data if previous else None, snapshot.data)
+    event = {
+        "version": snapshot.version,
+        "seq": seq,
+        "previous_version": previous.version if previous else None,
+        "previous_seq": previous.derived.get("seq") if previous else None,
+        **diff,
+    }
+    return {
+        "seq": seq,
+        "since": {},  # since-seq -> encoded delta body, filled on demand
+        "index": InsightIndex(snapshot.data, snapshot.version),
+        "change_event": _sse("insights", event, snapshot.version),
+    }
+
+insights_cache = InsightsCache(
+    fetch_insights,
+    encode_insights,
+    derive=build_derived,
+    ttl=INSIGHTS_CACHE_TTL,
+    max_stale=INSIGHTS_MAX_STALE,
+    refresh_interval=INSIGHTS_REFRESH_INTERVAL,
+    executor=sheets_executor,
+)
 
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-if not key_path or not os.path.exists(key_path):
-    raise Exception(f"Google service account file not found at {key_path}")
+# -----------------------------
+# Startup timing
+# -----------------------------
+startup_timing = {"import_to_ready_s": None, "import_to_first_response_s": None}
 
-creds = Credentials.from_service_account_file(key_path, scopes=SCOPES)
-client = gspread.authorize(creds)
+# -----------------------------
+# App lifespan
+# -----------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm the cache in the background; the worker accepts traffic immediately
+    insights_cache.start()
+    startup_timing["import_to_ready_s"] = round(time.perf_counter() - _IMPORT_STARTED, 4)
+    print(f"🚀 Backend ready {startup_timing['import_to_ready_s']}s after import")
+    yield
+    await insights_cache.stop()
+    sheets_executor.shutdown(wait=False, cancel_futures=True)
 
 # -----------------------------
 # FastAPI setup
 # -----------------------------
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Allow CORS for frontend
 app.add_middleware(
@@ -46,56 +155,213 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "Last-Modified", "X-Insights-Seq"],
 )
 
+@app.middleware("http")
+async def record_first_response(request: Request, call_next):
+    response = await call_next(request)
+    if startup_timing["import_to_first_response_s"] is None:
+        startup_timing["import_to_first_response_s"] = round(time.perf_counter() - _IMPORT_STARTED, 4)
+        print(f"⏱️ First response {startup_timing['import_to_first_response_s']}s after import")
+    return response
+
 # -----------------------------
-# Google Sheets info
+# Root endpoint (for sanity check)
 # -----------------------------
-INSIGHTS_SHEET = "llm_insights"
+@app.get("/")
+async def root():
+    return {"message": "FastAPI backend is running"}
 
 # -----------------------------
-# Helper function to fetch insights
+# Health endpoints
 # -----------------------------
-def fetch_insights():
+@app.get("/healthz")
+async def liveness():
+    """Liveness: the process is up and serving; never touches Google."""
+    return {"status": "alive"}
+
+@app.get("/readyz")
+async def readiness():
+    """Readiness: an insights snapshot is loaded and can be served."""
+    snapshot = insights_cache.snapshot
+    body = {"startup": startup_timing}
+    if snapshot is None:
+        body["status"] = "warming_up"
+        return JSONResponse(body, status_code=503)
+    body["status"] = "ready"
+    body["snapshot_age_s"] = round(snapshot.age(), 1)
+    body["seq"] = snapshot.derived["seq"]
+    body["pinned"] = insights_history.pinned_version()
+    return body
+
+# -----------------------------
+# Insights endpoint
+# -----------------------------
+MAX_CACHED_DELTAS = 32
+
+def _delta_body(snapshot, since):
+    """Encode the sections changed between history version `since` and the current snapshot."""
+    cached = snapshot.derived["since"].get(since)
+    if cached is not None:
+        return cached
+    seq = snapshot.derived["seq"]
+    if since == seq:
+        diff = {"changed": {}, "removed": []}
+    else:
+        record = insights_history.get(since)
+        if record is None:
+            return None
+        diff = diff_sections(parse_insight_document(record["insights"]), snapshot.data)
+    body = orjson.dumps({"seq": seq, "since": since, **diff})
+    if len(snapshot.derived["since"]) < MAX_CACHED_DELTAS:
+        snapshot.derived["since"][since] = body
+    return body
+
+@app.get("/api/insights")
+async def get_insights(request: Request, since: int = None):
     try:
-        sheet = client.open(INSIGHTS_SHEET).sheet1
-        rows = sheet.get_all_records()
-
-        if not rows:
-            return {"message": "No insights found in sheet."}
-        
-        print("🔍 Sample row from Google Sheet:", rows[0])  
-        return rows
+        snapshot = await insights_cache.get()
     except Exception as e:
         return {"error": str(e)}
+    seq_header = {"X-Insights-Seq": str(snapshot.derived["seq"])}
+    if since is None:
+        response = snapshot_response(request, snapshot)
+        response.headers.update(seq_header)
+        return response
+    loop = asyncio.get_running_loop()
+    body = await loop.run_in_executor(sheets_executor, _delta_body, snapshot, since)
+    if body is None:
+        raise HTTPException(status_code=410, detail=f"Unknown insights version {since}; fetch the full document.")
+    return Response(content=body, media_type="application/json", headers=seq_header)
 
-        # Clean and safely encode any problematic text
-        cleaned_rows = []
-        for row in rows:
-            safe_row = {}
-            for key, value in row.items():
-                if isinstance(value, str):
-                    # Replace newline & escape quotes to avoid invalid JSON
-                    value = value.replace("\n", " ").replace("\r", " ").replace('"', "'")
-                safe_row[key] = value
-            cleaned_rows.append(safe_row)
+# -----------------------------
+# Version history and rollback
+# -----------------------------
+def _check_token(request: Request):
+    if not INSIGHTS_REFRESH_TOKEN:
+        raise HTTPException(status_code=503, detail="INSIGHTS_REFRESH_TOKEN is not configured.")
+    if not hmac.compare_digest(request.headers.get("x-refresh-token", ""), INSIGHTS_REFRESH_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid refresh token.")
 
-        # Return JSON-safe structure
-        return json.loads(json.dumps(cleaned_rows, ensure_ascii=False))
+@app.get("/api/insights/versions")
+async def list_versions(limit: int = Query(50, ge=1, le=500)):
+    return {"pinned": insights_history.pinned_version(), "versions": insights_history.versions(limit)}
 
+@app.post("/api/insights/rollback/{version}")
+async def rollback(version: int, request: Request):
+    """Serve a previous version from the local history; no Google round trip involved."""
+    _check_token(request)
+    if insights_history.get(version) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown insights version {version}.")
+    insights_history.pin(version)
+    snapshot = await insights_cache.reload()
+    return {"pinned": version, "seq": snapshot.derived["seq"]}
+
+@app.delete("/api/insights/rollback")
+async def clear_rollback(request: Request):
+    _check_token(request)
+    insights_history.pin(None)
+    try:
+        snapshot = await insights_cache.reload()
     except Exception as e:
-        return {"error": str(e)}
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"pinned": None, "seq": snapshot.derived["seq"]}
+
+@app.post("/api/insights/refresh")
+async def refresh_insights(request: Request):
+    """Called by the LLM scripts after writing llm_insights so subscribers hear about it within seconds."""
+    _check_token(request)
+    try:
+        snapshot = await insights_cache.refresh()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"version": snapshot.version, "seq": snapshot.derived["seq"]}
 
 # -----------------------------
-# Root endpoint (for sanity check)
+# Change stream (server-sent events)
 # -----------------------------
-@app.get("/")
-def root():
-    return {"message": "FastAPI backend is running"}
+@app.get("/api/insights/stream")
+async def stream_insights(request: Request):
+    """Push `insights` events ({version, changed, removed}) whenever the snapshot changes."""
+    async def events():
+        # Subscribed only once the response starts streaming, so a request that never
+        # iterates (or is dropped before the first chunk) leaves no queue behind
+        queue = None
+        try:
+            queue = insights_cache.subscribe()
+            current = insights_cache.snapshot
+            if current is not None:
+                yield _sse("version", {"version": current.version}, current.version)
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), timeout=STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield b": ping\n\n"
+                    continue
+                yield snapshot.derived["change_event"]
+        finally:
+            if queue is not None:
+                insights_cache.unsubscribe(queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # -----------------------------
-# Insights endpoint
+# Query endpoints (served from per-snapshot indexes)
 # -----------------------------
-@app.get("/api/insights")
-def get_insights():
-    return fetch_insights()
+async def _current_index():
+    try:
+        snapshot = await insights_cache.get()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return snapshot.derived["index"]
+
+def _page(items, index, cursor, limit):
+    try:
+        return paginate(items, index.version, cursor=cursor, limit=limit)
+    except CursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _fields(raw, allowed):
+    try:
+        return parse_fields(raw, allowed)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/insights/competitors")
+async def list_competitors(fields: str = None, cursor: str = None, limit: int = Query(20, ge=1, le=100)):
+    index = await _current_index()
+    selected = _fields(fields, COMPETITOR_FIELDS)
+    page = _page(index.competitors, index, cursor, limit)
+    page["items"] = [project(doc, selected) for doc in page["items"]]
+    return ORJSONResponse({"version": index.version, **page})
+
+@app.get("/api/insights/competitors/{name}")
+async def get_competitor(name: str, fields: str = None):
+    index = await _current_index()
+    doc = index.competitor(name)
+    if doc is None:
+        raise HTTPException(status_code=404, detail=f"No insights for competitor '{name}'.")
+    return ORJSONResponse({"version": index.version, "item": project(doc, _fields(fields, COMPETITOR_FIELDS))})
+
+@app.get("/api/insights/recommendations/{section}")
+async def get_recommendations(section: str, cursor: str = None, limit: int = Query(20, ge=1, le=100)):
+    index = await _current_index()
+    key, items = index.section(section)
+    if items is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown section '{section}'. Available: {', '.join(RECOMMENDATION_SECTIONS)}",
+        )
+    return ORJSONResponse({"version": index.version, "section": key, **_page(items, index, cursor, limit)})
+
+@app.get("/api/insights/regulatory")
+async def get_regulatory(note_type: Optional[str] = Query(None, alias="type")):
+    index = await _current_index()
+    return ORJSONResponse({"version": index.version, "items": index.regulatory_notes(note_type)})
@@ -0,0 +1,70 @@
+# backend/responses.py
+
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+
+# -----------------------------
+# Content negotiation helpers
+# -----------------------------
+def negotiate_encoding(accept_encoding, available):
+    """Pick the best content-coding the client accepts out of `available` (br preferred over gzip)."""
+    if not accept_encoding:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    for coding in ("br", "gzip"):
+        q = accepted.get(coding, accepted.get("*", 0.0))
+        if coding in available and q > 0:
+            return coding
+    return None
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison: W/"x" matches "x" (compressed variants share one ETag)
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return etag in candidates
+
+def _not_modified_since(if_modified_since, last_modified):
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    return int(last_modified) <= int(since)
+
+
+# -----------------------------
+# Conditional, compressed snapshot response
+# -----------------------------
+def snapshot_response(request: Request, snapshot):
+    """Serve a cached snapshot with ETag/Last-Modified validation and pre-compressed bodies."""
+    headers = {
+        "ETag": snapshot.etag,
+        "Last-Modified": formatdate(snapshot.last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        if _etag_matches(if_none_match, snapshot.etag):
+            return Response(status_code=304, headers=headers)
+    elif request.headers.get("if-modified-since"):
+        if _not_modified_since(request.headers["if-modified-since"], snapshot.last_modified):
+            return Response(status_code=304, headers=headers)
+
+    coding = negotiate_encoding(request.headers.get("accept-encoding"), snapshot.compressed)
+    if coding is None:
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = coding
+    return Response(content=snapshot.compressed[coding], media_type="application/json", headers=headers)
@@ -0,0 +1,98 @@
+# bench_faiss.py
+
+import argparse
+import gc
+import os
+import resource
+import time
+
+import faiss
+import numpy as np
+
+from faiss_indexes import build_index, tune
+
+# -----------------------------
+# Recall / latency / memory benchmark for FAISS index types
+# -----------------------------
+# Synthetic corpus: clustered Gaussian vectors (roughly how chunk embeddings group by
+# topic). Recall@k is measured against exact flat search on the same vectors.
+
+
+def rss_mb():
+    """Current resident set size (Linux /proc), else peak RSS from getrusage."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if peak > 2**30 else peak / 1024  # bytes on macOS, KiB on Linux
+
+def synthetic_corpus(n, dim, queries, clusters=256, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    base = centers[rng.integers(clusters, size=n)] + 0.6 * rng.normal(size=(n, dim)).astype(np.float32)
+    picked = base[rng.choice(n, queries, replace=False)]
+    query = picked + 0.3 * rng.normal(size=(queries, dim)).astype(np.float32)
+    return np.ascontiguousarray(base), np.ascontiguousarray(query)
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+def timed_search(index, queries, k, rounds=3):
+    """Best-of-N wall time, to keep one-off noise out of the QPS figure."""
+    best, labels = float("inf"), None
+    for _ in range(rounds):
+        started = time.perf_counter()
+        _, labels = index.search(queries, k)
+        best = min(best, time.perf_counter() - started)
+    return labels, len(queries) / best
+
+def run(n, dim, n_queries, k, kinds, nprobes, ef_searches, threads):
+    if threads:
+        faiss.omp_set_num_threads(threads)
+    base, queries = synthetic_corpus(n, dim, n_queries)
+    print(f"📐 {n} vectors x {dim}d, {n_queries} queries, k={k}, {faiss.omp_get_max_threads()} threads\n")
+    print(f"{'index':<8} {'param':<14} {'build s':>8} {'index MB':>9} {'RSS +MB':>8} {'recall@k':>9} {'QPS':>10}")
+
+    truth = None
+    for kind in kinds:
+        gc.collect()
+        before = rss_mb()
+        started = time.perf_counter()
+        index = build_index(kind, base)
+        index.add(base)
+        build_s = time.perf_counter() - started
+        memory = rss_mb() - before
+        size = faiss.serialize_index(index).nbytes / 2**20
+        if kind == "flat":
+            truth, qps = timed_search(index, queries, k)
+            print(f"{kind:<8} {'exact':<14} {build_s:>8.2f} {size:>9.1f} {memory:>8.1f} {1.0:>9.3f} {qps:>10.0f}")
+            continue
+        if truth is None:
+            _, truth = faiss.knn(queries, base, k)
+        params = [("nprobe", p) for p in nprobes] if kind != "hnsw" else [("efSearch", e) for e in ef_searches]
+        for name, value in params:
+            tune(index, nprobe=value if name == "nprobe" else None, ef_search=value if name == "efSearch" else None)
+            labels, qps = timed_search(index, queries, k)
+            print(f"{kind:<8} {f'{name}={value}':<14} {build_s:>8.2f} {size:>9.1f} {memory:>8.1f} "
+                  f"{recall_at_k(labels, truth):>9.3f} {qps:>10.0f}")
+        del index
+    print("\nindex MB = serialized index size; RSS +MB = resident memory added while building it "
+          "(allocator reuse can hide part of it).")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare FAISS index types on a synthetic corpus")
+    parser.add_argument("--n", type=int, default=200000, help="corpus size")
+    parser.add_argument("--dim", type=int, default=384, help="vector dimension (1536 for OpenAI ada-002)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", default="flat,ivf,hnsw,ivfpq")
+    parser.add_argument("--nprobe", default="1,4,16,64", help="values tried for IVF types")
+    parser.add_argument("--ef-search", default="16,32,64,128", help="values tried for HNSW")
+    parser.add_argument("--threads", type=int, default=0, help="OpenMP threads (0 = FAISS default)")
+    args = parser.parse_args()
+
+    run(args.n, args.dim, args.queries, args.k, args.types.split(","),
+        [int(v) for v in args.nprobe.split(",")], [int(v) for v in args.ef_search.split(",")], args.threads)
@@ -0,0 +1,50 @@
+# checkpoints.py
+
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# -----------------------------
+# Durable per-source resume cursors
+# -----------------------------
+# A checkpoint is the last sheet row of a source that was fully processed, plus that
+# row's fingerprint. Retention can delete rows and shift row numbers, so a resumed run
+# first checks the fingerprint still sits at that row and otherwise rescans from the top
+# (cheap: already-enriched rows are skipped by the fingerprint index).
+CHECKPOINT_DB_PATH = os.getenv(
+    "CHECKPOINT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "checkpoints.db"),
+)
+
+
+class Checkpoints:
+    def __init__(self, path=CHECKPOINT_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " source TEXT PRIMARY KEY, row INTEGER NOT NULL, fingerprint TEXT, updated_at TEXT NOT NULL)"
+        )
+
+    def get(self, source):
+        """Return (row, fingerprint) of the last processed row, or (1, None) to start at the top."""
+        with self._lock:
+            row = self.conn.execute("SELECT row, fingerprint FROM checkpoints WHERE source = ?", (source,)).fetchone()
+        return (row[0], row[1]) if row else (1, None)
+
+    def set(self, source, row, fingerprint=None):
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (source, row, fingerprint, updated_at) VALUES (?, ?, ?, ?)",
+                (source, row, fingerprint, datetime.now(timezone.utc).isoformat()),
+            )
+
+    def reset(self, source=None):
+        with self._lock:
+            if source is None:
+                self.conn.execute("DELETE FROM checkpoints")
+            else:
+                self.conn.execute("DELETE FROM checkpoints WHERE source = ?", (source,))
@@ -1,23 +1,70 @@
 import { useEffect, useState, useRef } from "react";
 
+const API_BASE = "https://ai-competitive-insights.herokuapp.com";
+
 function Dashboard() {
   const [insights, setInsights] = useState(null);
   const [openSections, setOpenSections] = useState({});
 
+  // Version (content hash) of the document currently on screen
+  const versionRef = useRef(null);
+
   useEffect(() => {
-    fetch("https://ai-competitive-insights.herokuapp.com/api/insights")
-      .then((res) => res.json())
-      .then((data) => {
-        if (data.length > 0 && data[0].insights_raw) {
-          try {
-            const parsed = JSON.parse(data[0].insights_raw);
-            setInsights(parsed);
-          } catch (err) {
-            console.error("Error parsing cleaned insights JSON:", err);
-          }
-        }
-      })
-      .catch((err) => console.error("Error fetching insights:", err));
+    let loading = null;
+    const load = () => {
+      // One full fetch at a time; the ETag carries the version of the document
+      loading =
+        loading ||
+        fetch(`${API_BASE}/api/insights`)
+          .then((res) => {
+            const version = (res.headers.get("ETag") || "").replace(/^W\//, "").replace(/"/g, "");
+            return res.json().then((data) => ({ data, version }));
+          })
+          .then(({ data, version }) => {
+            // The backend serves the validated insight document directly
+            if (data && !data.error && !data.message) {
+              setInsights(data);
+              versionRef.current = version;
+            } else {
+              console.error("No insights available:", data?.error || data?.message);
+            }
+          })
+          .catch((err) => console.error("Error fetching insights:", err))
+          .finally(() => {
+            loading = null;
+          });
+      return loading;
+    };
+    load();
+    // Make sure `version` (or something newer) ends up on screen, after any fetch in flight
+    const catchUp = (version) => {
+      (loading || Promise.resolve()).then(() => {
+        if (version !== versionRef.current) load();
+      });
+    };
+
+    // Live updates: the backend pushes only the sections that changed. A patch is applied
+    // only on top of the version it was computed from; events dropped by the server or
+    // missed while disconnected show up as a version mismatch and trigger a full reload.
+    const stream = new EventSource(`${API_BASE}/api/insights/stream`);
+    stream.addEventListener("version", (event) => {
+      // Sent on every (re)connect
+      catchUp(JSON.parse(event.data).version);
+    });
+    stream.addEventListener("insights", (event) => {
+      const { version, previous_version, changed = {}, removed = [] } = JSON.parse(event.data);
+      if (loading || previous_version !== versionRef.current) {
+        catchUp(version);
+        return;
+      }
+      versionRef.current = version;
+      setInsights((prev) => {
+        const next = { ...(prev || {}), ...changed };
+        removed.forEach((key) => delete next[key]);
+        return next;
+      });
+    });
+    return () => stream.close();
   }, []);
 
   if (!insights)
@@ -9,3 +9,39 @@ export async function fetchInsights() {
     return null;
   }
 }
+
+// Slices of the insight document served from backend indexes
+const API_BASE = "https://ai-competitive-insights.herokuapp.com/api/insights";
+
+async function getJSON(url) {
+  try {
+    const response = await fetch(url);
+    if (!response.ok) throw new Error(`Request failed: ${url}`);
+    return await response.json();
+  } catch (err) {
+    console.error(err);
+    return null;
+  }
+}
+
+export function fetchCompetitors({ fields, cursor, limit = 20 } = {}) {
+  const params = new URLSearchParams({ limit });
+  if (fields) params.set("fields", fields.join(","));
+  if (cursor) params.set("cursor", cursor);
+  return getJSON(`${API_BASE}/competitors?${params}`);
+}
+
+export function fetchCompetitor(name) {
+  return getJSON(`${API_BASE}/competitors/${encodeURIComponent(name)}`);
+}
+
+export function fetchRecommendations(section, { cursor, limit = 20 } = {}) {
+  const params = new URLSearchParams({ limit });
+  if (cursor) params.set("cursor", cursor);
+  return getJSON(`${API_BASE}/recommendations/${encodeURIComponent(section)}?${params}`);
+}
+
+export function fetchRegulatoryNotes(type) {
+  const query = type ? `?type=${encodeURIComponent(type)}` : "";
+  return getJSON(`${API_BASE}/regulatory${query}`);
+}
@@ -1,35 +1,104 @@
 import os
+import sys
+import time
 from dotenv import load_dotenv
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import FAISS
+import gspread
 from langchain.docstore.document import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from sheets_helper import iter_records, open_ws
+from vector_store import add_new_documents, embeddings_for, indexed_ids, load_store, save_store
 
 # ✅ Load environment variables from .env
 load_dotenv()
 
-# 🔑 Get OpenAI API key
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    raise ValueError("❌ OPENAI_API_KEY not found in .env file")
+# -----------------------------
+# Sources: sheet title + the columns that carry text (None = every non-metadata column)
+# -----------------------------
+SOURCES = {
+    "reviews": ("webdata_reviews", None),
+    "online_reviews": ("online_reviews_rating", ["review_title", "review_text", "product_name", "rating"]),
+    "reddit": ("reddit_discussions", ["Title", "Text", "Relevant Comments"]),
+    "news": ("news_articles", ["title", "description", "competitor"]),
+    "summaries": ("webdata_summaries", ["title", "snippet", "additional_info"]),
+    "regulatory": ("regulatory_updates", None),
+    "wikipedia": ("wikipedia_summaries", ["page", "summary", "competitor"]),
+}
+URL_FIELDS = ("url", "URL", "source_url")
+DATE_FIELDS = ("Date", "date", "published_at", "review_date", "retrieved_at")
+META_FIELDS = set(URL_FIELDS) | set(DATE_FIELDS) | {"review_id", "_fingerprint"}
 
-# 1. Example text (later we’ll replace with scraped reviews or other data)
-text = """
-This is a test document about competitive analysis.
-Competitors are focusing on pricing and marketing strategies.
-Customers mention product quality and fast shipping as positives.
-"""
+CHUNK_SIZE = int(os.getenv("EMBED_CHUNK_SIZE", "1000"))
+CHUNK_OVERLAP = int(os.getenv("EMBED_CHUNK_OVERLAP", "100"))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "512"))  # chunks per add_documents call
 
-# 2. Split into chunks
-splitter = RecursiveCharacterTextSplitter(chunk_size=100, chunk_overlap=20)
-docs = [Document(page_content=chunk) for chunk in splitter.split_text(text)]
+splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
 
-print(f"✅ Created {len(docs)} chunks")
 
-# 3. Convert chunks into embeddings
-embeddings = OpenAIEmbeddings(openai_api_key=openai_api_key)
-vectorstore = FAISS.from_documents(docs, embeddings)
+def row_text(record, text_fields):
+    fields = text_fields or [k for k in record if k not in META_FIELDS]
+    parts = [f"{f}: {record[f]}" for f in fields if str(record.get(f, "")).strip()]
+    return "\n".join(parts)
 
-# 4. Save vector DB locally
-vectorstore.save_local("faiss_store")
-print("🎉 Embeddings created and stored in faiss_store folder!")
\ No newline at end of file
+def iter_documents(source, sheet_title, text_fields):
+    """Stream one sheet as chunked Documents with source metadata."""
+    try:
+        ws = open_ws(sheet_title)
+    except gspread.SpreadsheetNotFound:
+        print(f"⚠️ Sheet {sheet_title} not found, skipping.")
+        return
+    for row_number, record in iter_records(ws, with_row=True):
+        text = row_text(record, text_fields)
+        if not text:
+            continue
+        metadata = {
+            "source": source,
+            "sheet": sheet_title,
+            "row": row_number,
+            "url": next((str(record[f]) for f in URL_FIELDS if record.get(f)), ""),
+            "date": next((str(record[f]) for f in DATE_FIELDS if record.get(f)), ""),
+        }
+        for i, chunk in enumerate(splitter.split_text(text)):
+            yield Document(page_content=chunk, metadata={**metadata, "chunk": i})
+
+def batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def ingest(sources=None):
+    """Add every not-yet-indexed chunk from the source sheets to the FAISS store.
+
+    Chunks are content-addressed, so only new text is embedded; the existing index is
+    loaded and extended with add_documents, and saved after each source that added data.
+    """
+    embeddings = embeddings_for("index")
+    store = load_store("index", embeddings)
+    known = indexed_ids(store)
+    print(f"📦 Loaded index with {store.index.ntotal if store else 0} vectors.")
+    started, total_seen, total_added = time.perf_counter(), 0, 0
+    for source in sources or SOURCES:
+        sheet_title, text_fields = SOURCES[source]
+        seen = added = 0
+        for batch in batched(iter_documents(source, sheet_title, text_fields), EMBED_BATCH_SIZE):
+            store, n = add_new_documents(batch, embeddings=embeddings, store=store, save=False, known=known)
+            seen, added = seen + len(batch), added + n
+        if added:
+            save_store(store, "index", embeddings)
+        print(f"✅ {source}: {added} new of {seen} chunks embedded.")
+        total_seen, total_added = total_seen + seen, total_added + added
+    print(f"🎉 Indexed {total_added} new chunks ({total_seen} scanned) in {time.perf_counter() - started:.1f}s; "
+          f"index now holds {store.index.ntotal if store else 0} vectors.")
+    return store
+
+
+if __name__ == "__main__":
+    # python embed_store.py [source ...]   (default: all sources)
+    unknown = [s for s in sys.argv[1:] if s not in SOURCES]
+    if unknown:
+        raise SystemExit(f"❌ Unknown source(s): {', '.join(unknown)}. Choose from: {', '.join(SOURCES)}")
+    ingest(sys.argv[1:] or None)
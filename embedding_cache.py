@@ -0,0 +1,140 @@
+# embedding_cache.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# -----------------------------
+# Disk-backed embedding cache
+# -----------------------------
+# Per model: vectors.bin holds fixed-width rows (float16 by default) read through
+# np.memmap, and index.db maps sha256(kind|normalized text) -> row number.
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "embedding_cache"),
+)
+EMBEDDING_CACHE_DTYPE = os.getenv("EMBEDDING_CACHE_DTYPE", "float16")  # float16 | float32
+
+
+def text_key(text, kind="document"):
+    normalized = re.sub(r"\s+", " ", text or "").strip()
+    return hashlib.sha256(f"{kind}|{normalized}".encode("utf-8")).hexdigest()
+
+def model_id(embeddings):
+    name = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    return f"{type(embeddings).__name__}-{name}" if name else type(embeddings).__name__
+
+
+class VectorCache:
+    """Append-only memmapped vector file plus a SQLite offset index."""
+
+    def __init__(self, folder, dtype=EMBEDDING_CACHE_DTYPE):
+        os.makedirs(folder, exist_ok=True)
+        self.vectors_path = os.path.join(folder, "vectors.bin")
+        self.dtype = np.dtype(dtype)
+        self._lock = threading.Lock()
+        self._mmap, self._mmap_rows = None, 0
+        self.conn = sqlite3.connect(os.path.join(folder, "index.db"), check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS offsets (key TEXT PRIMARY KEY, row INTEGER NOT NULL)")
+        meta = dict(self.conn.execute("SELECT key, value FROM meta"))
+        self.dim = int(meta["dim"]) if "dim" in meta else None
+        if "dtype" in meta:
+            self.dtype = np.dtype(meta["dtype"])  # an existing file keeps its width
+
+    def _rows(self):
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (self.dim * self.dtype.itemsize)
+
+    def _view(self):
+        rows = self._rows()
+        if self._mmap is None or self._mmap_rows != rows:
+            self._mmap = np.memmap(self.vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim)) if rows else None
+            self._mmap_rows = rows
+        return self._mmap
+
+    def get_many(self, keys):
+        """{key: float32 vector} for the keys present."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ", ".join("?" for _ in chunk)
+                found.update(self.conn.execute(f"SELECT key, row FROM offsets WHERE key IN ({marks})", chunk))
+            if not found:
+                return {}
+            view = self._view()
+            return {k: np.asarray(view[row], dtype=np.float32) for k, row in found.items() if row < self._mmap_rows}
+
+    def put_many(self, items):
+        """Append [(key, vector)]; keys already present are skipped."""
+        if not items:
+            return
+        vectors = np.asarray([v for _, v in items], dtype=np.float32)
+        with self._lock, open(self.vectors_path, "ab") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    self.conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                                          [("dim", str(self.dim)), ("dtype", self.dtype.name)])
+                if vectors.shape[1] != self.dim:
+                    raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match cached {self.dim}")
+                start = self._rows()
+                f.write(vectors.astype(self.dtype).tobytes())
+                f.flush()
+                self.conn.execute("BEGIN")
+                self.conn.executemany("INSERT OR IGNORE INTO offsets (key, row) VALUES (?, ?)",
+                                      [(key, start + i) for i, (key, _) in enumerate(items)])
+                self.conn.execute("COMMIT")
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps any LangChain Embeddings; only text never seen for this model is sent to it."""
+
+    def __init__(self, embeddings, folder=None, dtype=EMBEDDING_CACHE_DTYPE):
+        self.embeddings = embeddings
+        self.model_id = model_id(embeddings)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", self.model_id)
+        self.cache = VectorCache(folder or os.path.join(EMBEDDING_CACHE_DIR, slug), dtype)
+        self.stats = {"hits": 0, "misses": 0}
+
+    def _embed(self, texts, kind, compute):
+        keys = [text_key(t, kind) for t in texts]
+        cached = self.cache.get_many(list(set(keys)))
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+        self.stats["hits"] += len(texts) - sum(1 for k in keys if k in missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            fresh = compute(list(missing.values()))
+            new = list(zip(missing.keys(), fresh))
+            self.cache.put_many(new)
+            # Return exactly what later hits will read back
+            dtype = self.cache.dtype
+            cached.update((k, np.asarray(v, dtype=dtype).astype(np.float32)) for k, v in new)
+        return [cached[k].tolist() for k in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(list(texts), "document", self.embeddings.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "query", lambda ts: [self.embeddings.embed_query(ts[0])])[0]
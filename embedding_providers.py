@@ -0,0 +1,104 @@
+# embedding_providers.py
+
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# -----------------------------
+# Embedding providers
+# -----------------------------
+#   openai   - OpenAIEmbeddings (network, API quota)
+#   local    - a sentence-transformers model on CPU (pip install sentence-transformers)
+#   hashing  - deterministic hashing vectorizer; no model, no network (tests, air-gapped builds)
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_THREADS = int(os.getenv("LOCAL_EMBEDDING_THREADS", str(min(4, os.cpu_count() or 1))))
+HASHING_DIM = int(os.getenv("HASHING_EMBEDDING_DIM", "768"))
+
+
+class HashingEmbeddings(Embeddings):
+    """Signed feature hashing of word unigrams and bigrams, L2-normalized.
+
+    Same text -> same vector on every machine, so stores built with it are reproducible.
+    """
+
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+        self.model = f"hashing-{dim}"
+
+    def _vector(self, text):
+        tokens = re.findall(r"\w+", (text or "").lower())
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+            vec[h % self.dim] += 1.0 if h >> 63 else -1.0
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_documents(self, texts):
+        return [self._vector(t).tolist() for t in texts]
+
+    def embed_query(self, text):
+        return self._vector(text).tolist()
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """CPU sentence-embedding model; batches are encoded on a small thread pool
+    (torch releases the GIL, so threads share cores without extra processes)."""
+
+    def __init__(self, model_name=LOCAL_EMBEDDING_MODEL, batch_size=EMBEDDING_BATCH_SIZE, threads=EMBEDDING_THREADS):
+        try:
+            import torch
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("❌ The local embedding provider needs `pip install sentence-transformers`.") from e
+        torch.set_num_threads(max(1, (os.cpu_count() or 1) // max(1, threads)))
+        self.model = model_name
+        self.batch_size, self.threads = batch_size, threads
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts):
+        return self._model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                  convert_to_numpy=True, show_progress_bar=False)
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        step = self.batch_size * 4
+        chunks = [texts[i:i + step] for i in range(0, len(texts), step)]
+        if len(chunks) == 1 or self.threads <= 1:
+            return self._encode(texts).tolist()
+        with ThreadPoolExecutor(max_workers=self.threads) as pool:
+            return np.vstack(list(pool.map(self._encode, chunks))).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def make_embeddings(provider):
+    if provider == "openai":
+        from langchain_openai import OpenAIEmbeddings
+
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+        if not openai_api_key:
+            raise ValueError("❌ OPENAI_API_KEY not found in .env file")
+        return OpenAIEmbeddings(openai_api_key=openai_api_key)
+    if provider == "local":
+        return SentenceTransformerEmbeddings()
+    if provider == "hashing":
+        return HashingEmbeddings()
+    raise ValueError(f"❌ Unknown embedding provider '{provider}' (openai, local, hashing)")
+
+def provider_name(embeddings):
+    inner = getattr(embeddings, "embeddings", embeddings)  # unwrap CachedEmbeddings
+    if isinstance(inner, HashingEmbeddings):
+        return "hashing"
+    if isinstance(inner, SentenceTransformerEmbeddings):
+        return "local"
+    return "openai"
@@ -0,0 +1,109 @@
+# faiss_indexes.py
+
+import math
+import os
+
+import faiss
+import numpy as np
+
+# -----------------------------
+# FAISS index types
+# -----------------------------
+#   flat   - exact search; memory and query time grow linearly (LangChain's default)
+#   ivf    - IVF-Flat: k-means cells, only `nprobe` cells scanned per query
+#   hnsw   - graph search, no training; `efSearch` trades speed for recall
+#   ivfpq  - IVF with product-quantized codes (~pq_m bytes/vector), lossy but compact
+# All use L2 distance, like the LangChain default. Pick one with FAISS_INDEX_TYPE
+# (or FAISS_INDEX_TYPE_<NAME> per index); bench_faiss.py measures the trade-off.
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
+FAISS_INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat")
+FAISS_NLIST = int(os.getenv("FAISS_NLIST", "0"))  # 0 = about 4*sqrt(n)
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_EF_CONSTRUCTION = int(os.getenv("FAISS_EF_CONSTRUCTION", "80"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "16"))  # bytes per vector code
+FAISS_TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "50000"))
+MIN_POINTS_PER_CELL = 39  # below this k-means training warns and quality drops
+
+
+def index_type_for(index_name):
+    kind = os.getenv(f"FAISS_INDEX_TYPE_{index_name.upper()}") or FAISS_INDEX_TYPE
+    if kind not in INDEX_TYPES:
+        raise ValueError(f"❌ Unknown FAISS index type '{kind}' ({', '.join(INDEX_TYPES)})")
+    return kind
+
+def default_nlist(n):
+    return max(1, min(int(4 * math.sqrt(n)), n // MIN_POINTS_PER_CELL))
+
+def _pq_m(dim, wanted):
+    """Largest sub-quantizer count <= wanted that divides dim."""
+    return next(m for m in range(min(wanted, dim), 0, -1) if dim % m == 0)
+
+def min_training_points(kind, nlist):
+    if kind == "ivf":
+        return nlist * MIN_POINTS_PER_CELL
+    if kind == "ivfpq":
+        return max(nlist * MIN_POINTS_PER_CELL, 256 * MIN_POINTS_PER_CELL)  # 8-bit PQ codebooks
+    return 0
+
+def factory_string(kind, dim, n, nlist=None, hnsw_m=FAISS_HNSW_M, pq_m=FAISS_PQ_M):
+    nlist = nlist or FAISS_NLIST or default_nlist(n)
+    return {
+        "flat": "Flat",
+        "ivf": f"IVF{nlist},Flat",
+        "hnsw": f"HNSW{hnsw_m}",
+        "ivfpq": f"IVF{nlist},PQ{_pq_m(dim, pq_m)}x8np",  # np: skip polysemous training (unused, ~50x slower)
+    }[kind]
+
+def tune(index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH):
+    """Apply query-time knobs; a no-op for index types they do not apply to.
+
+    IVF indexes also get a direct map: LangChain's MMR search reconstructs vectors by id.
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    if ivf is not None and nprobe:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if hasattr(index, "hnsw") and ef_search:
+        index.hnsw.efSearch = ef_search
+    return index
+
+def build_index(kind, vectors, nlist=None, hnsw_m=FAISS_HNSW_M, pq_m=FAISS_PQ_M,
+                train_sample=FAISS_TRAIN_SAMPLE, seed=0):
+    """Empty, trained index of `kind` for vectors like these (the caller adds them).
+
+    IVF quantizers are trained on a random sample of at most `train_sample` rows;
+    too few rows to train falls back to flat with a warning.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dim = vectors.shape
+    nlist = nlist or FAISS_NLIST or default_nlist(n)
+    if n < min_training_points(kind, nlist):
+        print(f"⚠️ {n} vectors are too few to train {kind} (need {min_training_points(kind, nlist)}); using flat.")
+        kind = "flat"
+    index = faiss.index_factory(dim, factory_string(kind, dim, n, nlist, hnsw_m, pq_m), faiss.METRIC_L2)
+    if kind == "hnsw":
+        index.hnsw.efConstruction = FAISS_EF_CONSTRUCTION
+    if not index.is_trained:
+        sample_size = max(min(train_sample, n), min_training_points(kind, nlist))
+        rng = np.random.default_rng(seed)
+        sample = vectors if n <= sample_size else vectors[rng.choice(n, sample_size, replace=False)]
+        index.train(sample)
+    return tune(index)
+
+def index_kind(index):
+    """Name of an index's type, as used in INDEX_TYPES."""
+    if hasattr(index, "hnsw"):
+        return "hnsw"
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return "ivfpq" if isinstance(ivf, faiss.IndexIVFPQ) else "ivf"
+    return "flat"
+
+def stored_vectors(index):
+    """All vectors of an exact index (flat/IVF-Flat/HNSW-flat), or None when they are not recoverable."""
+    if index_kind(index) in ("flat", "ivf", "hnsw") and index.ntotal:
+        return index.reconstruct_n(0, index.ntotal)
+    return None
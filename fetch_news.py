@@ -1,8 +1,8 @@
 # fetch_news.py 
 import feedparser
 from urllib.parse import quote_plus, urlparse
-from datetime import datetime, timedelta
-from sheets_helper import open_ws, ensure_header, get_existing_values_in_column, append_dicts
+from datetime import datetime
+from sheets_helper import open_ws, ensure_header, get_existing_values_in_column, append_dicts, apply_retention
 
 # Your Google Sheet title must be exactly this:
 SHEET_TITLE = "news_articles"
@@ -87,27 +87,9 @@ def fetch_news_rows():
 
 def cleanup_old_rows(ws, cutoff_days=250):
     """Remove rows older than cutoff_days (keeps sheet fresh)"""
-    cutoff = datetime.utcnow() - timedelta(days=cutoff_days)
-    values = ws.get_all_records()
-
-    # Keep only rows with published_at >= cutoff
-    keep_rows = []
-    for row in values:
-        try:
-            if row.get("published_at"):
-                dt = datetime.fromisoformat(row["published_at"])
-                if dt >= cutoff:
-                    keep_rows.append(row)
-        except Exception:
-            keep_rows.append(row)
-
-    # Rewrite sheet: header + kept rows
-    ws.clear()
-    ws.append_row(COLUMNS)
-    for r in keep_rows:
-        ws.append_row([r.get(col, "") for col in COLUMNS])
-
-    print(f"🧹 Cleanup done: kept {len(keep_rows)} rows (last {cutoff_days} days).")
+    # Rows without a published_at are dropped, rows with an unparseable one are kept
+    kept, removed = apply_retention(ws, "published_at", cutoff_days, date_format="ISO8601", drop_empty=True)
+    print(f"🧹 Cleanup done: kept {kept} rows, removed {removed} (last {cutoff_days} days).")
 
 def main():
     ws = open_ws(SHEET_TITLE)
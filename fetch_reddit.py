@@ -2,7 +2,8 @@ import os
 from dotenv import load_dotenv
 import praw
 from datetime import datetime, timedelta, timezone
-from sheets_helper import open_ws
+from sheets_helper import open_ws, apply_retention
+from sheets_writer import write_rows
 
 # -------------------------------
 # Load environment variables
@@ -158,7 +159,7 @@ for subreddit_name in SUBREDDITS:
 # -------------------------------
 if rows_to_add:
     try:
-        sheet.append_rows(rows_to_add, value_input_option="USER_ENTERED")
+        write_rows(sheet, rows_to_add, value_input_option="USER_ENTERED")
         print(f"Added {len(rows_to_add)} new posts to the sheet.")
     except Exception as e:
         print(f"Error writing to Google Sheet: {e}")
@@ -168,16 +169,6 @@ else:
 # -------------------------------
 # Cleanup old rows (older than 399 days)
 # -------------------------------
-all_rows = sheet.get_all_records()
-cutoff = datetime.now(timezone.utc) - timedelta(days=399)
-rows_to_delete = []
+kept, removed = apply_retention(sheet, "Date", 399, date_format="%Y-%m-%d %H:%M:%S", mode="delete")
 
-for i, row in enumerate(all_rows, start=2):  # start=2 because first row is header
-    row_date = datetime.strptime(row['Date'], "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
-    if row_date < cutoff:
-        rows_to_delete.append(i)
-
-for idx in reversed(rows_to_delete):
-    sheet.delete_rows(idx)
-
-print(f"Cleaned up {len(rows_to_delete)} old rows.")
\ No newline at end of file
+print(f"Cleaned up {removed} old rows.")
\ No newline at end of file
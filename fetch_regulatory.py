@@ -1,24 +1,16 @@
 import requests
 from bs4 import BeautifulSoup
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from datetime import datetime
 import re
-import os
 from dotenv import load_dotenv
+from sheets_helper import open_ws
+from sheets_writer import write_rows
 
 # --- Google Sheets Setup ---
 load_dotenv()
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-if not key_path:
-    raise ValueError("❌ GOOGLE_APPLICATION_CREDENTIALS not set in .env")
-
-scope = ["https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"]
-creds = ServiceAccountCredentials.from_json_keyfile_name(key_path, scope)
-gc = gspread.authorize(creds)
 
 sheet_name = "regulatory_updates"
-sheet = gc.open(sheet_name).sheet1
+sheet = open_ws(sheet_name)
 
 # --- Sources & Keywords ---
 SOURCES = [
@@ -63,6 +55,7 @@ def fetch_updates():
     return updates
 
 def save_to_gsheet(updates):
+    rows = []
     for update in updates:
         row = [
             update["source_url"],
@@ -74,7 +67,8 @@ def save_to_gsheet(updates):
             update["summarized"],
             update["date"]
         ]
-        sheet.append_row(row)
+        rows.append(row)
+    write_rows(sheet, rows)
 
 if __name__ == "__main__":
     updates = fetch_updates()
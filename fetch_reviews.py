@@ -1,10 +1,9 @@
 import requests
 from bs4 import BeautifulSoup
-import gspread
-from google.oauth2.service_account import Credentials
 from datetime import datetime
 from dotenv import load_dotenv
-import os
+from sheets_helper import open_ws
+from sheets_writer import write_rows
 
 # Load environment variables
 load_dotenv()
@@ -12,16 +11,7 @@ load_dotenv()
 # === Google Sheets Setup ===
 SHEET_NAME = "webdata_reviews"  # your Google Sheet name
 
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-
-creds = Credentials.from_service_account_file(key_path, scopes=SCOPES)
-client = gspread.authorize(creds)
-sheet = client.open(SHEET_NAME).sheet1
+sheet = open_ws(SHEET_NAME)
 
 # === Helper function to scrape reviews from an eBay product reviews page ===
 def scrape_ebay_reviews(url):
@@ -83,7 +73,7 @@ if __name__ == "__main__":
         all_reviews.extend(reviews)
 
     if all_reviews:
-        sheet.append_rows(all_reviews)
+        write_rows(sheet, all_reviews)
         print(f"✅ Stored {len(all_reviews)} reviews into {SHEET_NAME}")
     else:
         print("⚠️ No reviews found.")
@@ -1,22 +1,15 @@
 import time
-import gspread
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.common.by import By
 from selenium.webdriver.chrome.options import Options
-from google.oauth2.service_account import Credentials
 from datetime import datetime
-import os
+from sheets_helper import open_ws
+from sheets_writer import write_rows
 
 # === Google Sheets Setup ===
 SHEET_NAME = "webdata_reviews"
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", 
-          "https://www.googleapis.com/auth/drive"]
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")  # ensure your env variable is set
-
-creds = Credentials.from_service_account_file(key_path, scopes=SCOPES)
-client = gspread.authorize(creds)
-sheet = client.open(SHEET_NAME).sheet1
+sheet = open_ws(SHEET_NAME)
 
 # === Selenium Setup ===
 chrome_options = Options()
@@ -142,7 +135,7 @@ if __name__ == "__main__":
         all_reviews.extend(reviews)
 
     if all_reviews:
-        sheet.append_rows(all_reviews)
+        write_rows(sheet, all_reviews)
         print(f"✅ Stored {len(all_reviews)} reviews into {SHEET_NAME}")
     else:
         print("⚠️ No 2024/2025 reviews found.")
@@ -1,9 +1,6 @@
 # fetch_reviews_selenium_2025.py
-import os
 from datetime import datetime
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.service_account import Credentials
 
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
@@ -11,20 +8,15 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+from sheets_helper import open_ws
+from sheets_writer import write_rows
 
 # Load env
 load_dotenv()
 
 # === Google Sheets Setup ===
 SHEET_NAME = "webdata_reviews"
-SCOPES = ["https://www.googleapis.com/auth/spreadsheets", 
-          "https://www.googleapis.com/auth/drive"]
-
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-
-creds = Credentials.from_service_account_file(key_path, scopes=SCOPES)
-client = gspread.authorize(creds)
-sheet = client.open(SHEET_NAME).sheet1
+sheet = open_ws(SHEET_NAME)
 
 # === Selenium Setup ===
 chrome_options = Options()
@@ -109,7 +101,7 @@ if __name__ == "__main__":
     driver.quit()
 
     if all_reviews:
-        sheet.append_rows(all_reviews)
+        write_rows(sheet, all_reviews)
         print(f"✅ Stored {len(all_reviews)} 2025 reviews into {SHEET_NAME}")
     else:
         print("⚠️ No 2025 reviews found.")
@@ -7,8 +7,9 @@ from urllib.parse import urlparse
 from dotenv import load_dotenv
 from bs4 import BeautifulSoup
 
-import gspread
 from gspread.exceptions import APIError
+from sheets_helper import open_ws
+from sheets_writer import call_with_backoff, write_rows
 
 # Optional playwright import (only used if installed)
 USE_PLAYWRIGHT = False
@@ -25,14 +26,10 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
 GSHEET_NAME = "webdata_summaries"
-SERVICE_ACCOUNT_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
 if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
     raise RuntimeError("GOOGLE_API_KEY or GOOGLE_CSE_ID missing in .env")
 
-if not SERVICE_ACCOUNT_FILE:
-    raise RuntimeError("GOOGLE_APPLICATION_CREDENTIALS missing in .env")
-
 # polite scraping
 REQUEST_DELAY = 1.0  # seconds between requests (increase if you see rate limits)
 SEARCH_RESULTS_PER_QUERY = 5
@@ -139,9 +136,7 @@ def scrape_url(url):
 # -------------
 # Google Sheets setup
 # -------------
-gc = gspread.service_account(filename=SERVICE_ACCOUNT_FILE)
-sh = gc.open(GSHEET_NAME)
-worksheet = sh.sheet1
+worksheet = open_ws(GSHEET_NAME)
 
 # Check header (ensure header exists)
 expected_header = ["source", "title", "snippet", "url", "retrieved_at", "additional_info"]
@@ -149,7 +144,7 @@ first_row = worksheet.row_values(1)
 if not first_row or first_row[0].lower() != "source":
     # optionally set header
     try:
-        worksheet.insert_row(expected_header, index=1)
+        call_with_backoff(worksheet.insert_row, expected_header, index=1, idempotent=False)
     except APIError:
         pass
 
@@ -203,20 +198,11 @@ for q in queries:
         rows_to_append.append(row)
         time.sleep(REQUEST_DELAY)
 
-# Batch append (do in chunks to avoid gspread rate limits)
-BATCH = 50
-for i in range(0, len(rows_to_append), BATCH):
-    batch = rows_to_append[i:i+BATCH]
-    try:
-        worksheet.append_rows(batch, value_input_option="RAW")
-        print(f"Appended rows {i}..{i+len(batch)-1}")
-    except Exception as e:
-        print("Failed append chunk:", e)
-        # fallback: append one by one
-        for r in batch:
-            try:
-                worksheet.append_row(r)
-            except Exception as e2:
-                print("append_row error", e2)
+# One append_rows call, rate-limited and retried with backoff on 429/5xx
+# instead of falling back to row-by-row appends
+try:
+    write_rows(worksheet, rows_to_append)
+except Exception as e:
+    print("Failed append:", e)
 
 print("Done. Total rows appended:", len(rows_to_append))
\ No newline at end of file
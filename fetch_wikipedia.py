@@ -1,30 +1,21 @@
 # fetch_wikipedia.py
 
-import os
-import gspread
 import wikipedia
 import pandas as pd
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
+from sheets_helper import open_ws
+from sheets_writer import replace_rows
+
 # -------------------------
 # Load environment variables
 # -------------------------
 load_dotenv()  # Make sure your .env is in the same directory
 
-# Google Sheets credentials
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-if not key_path:
-    raise ValueError("Google service account JSON path not found. Please set GOOGLE_APPLICATION_CREDENTIALS in .env")
-
-gc = gspread.service_account(filename=key_path)
+# Google Sheets (created on first run if it does not exist yet)
 sheet_name = "wikipedia_summaries"
-try:
-    sheet = gc.open(sheet_name).sheet1
-except gspread.SpreadsheetNotFound:
-    # If sheet does not exist, create one
-    sh = gc.create(sheet_name)
-    sheet = sh.sheet1
+sheet = open_ws(sheet_name, create=True)
 
 # -------------------------
 # Define competitors and keywords
@@ -106,8 +97,7 @@ for comp in competitors:
 # -------------------------
 if records:
     df = pd.DataFrame(records)
-    sheet.clear()  # Optional: clear previous data
-    sheet.update([df.columns.values.tolist()] + df.values.tolist())
+    replace_rows(sheet, [df.columns.values.tolist()] + df.values.tolist())  # replaces previous data
     print(f"Updated Google Sheet '{sheet_name}' with {len(records)} records.")
 else:
     print("No relevant records found in last 8 months.")
\ No newline at end of file
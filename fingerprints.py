@@ -0,0 +1,105 @@
+# fingerprints.py
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime, timezone
+
+# -----------------------------
+# Persistent index of already-enriched source rows
+# -----------------------------
+# A fingerprint is a normalized hash of the fields that identify a source row, so a row
+# is recognised again regardless of its enrichment columns, cell formatting or re-scrape
+# timestamps. The index lives locally in SQLite and is mirrored into the hidden
+# `_fingerprint` column of each *_enriched sheet, from which it can be rebuilt.
+FINGERPRINT_DB_PATH = os.getenv(
+    "FINGERPRINT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "fingerprints.db"),
+)
+FINGERPRINT_COLUMN = "_fingerprint"
+
+# Identity fields per source type; sources not listed hash every non-volatile field
+IDENTITY_FIELDS = {
+    "reddit": ("Title",),  # the pipeline treats reposts under one title as the same post
+    "summary": ("url", "title"),
+}
+# Columns that change between scrapes/runs without the row being new
+VOLATILE_FIELDS = {
+    "enriched_analysis", FINGERPRINT_COLUMN,
+    "retrieved_at", "scraped_at", "fetched_at", "timestamp", "Relevant Comments",
+}
+
+
+def _normalize(value):
+    text = unicodedata.normalize("NFKC", str(value if value is not None else ""))
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+def fingerprint(record, source_type=None):
+    """Stable hash of a row's identity fields (works on raw and enriched rows alike)."""
+    fields = IDENTITY_FIELDS.get(source_type)
+    if fields is None or not any(record.get(f) not in (None, "") for f in fields):
+        fields = sorted(k for k in record if k not in VOLATILE_FIELDS)
+    canonical = "\x1f".join(f"{f}={_normalize(record.get(f))}" for f in fields)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class FingerprintIndex:
+    """SQLite set of (source, fingerprint); load() gives an in-memory set for O(1) checks."""
+
+    def __init__(self, path=FINGERPRINT_DB_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints ("
+            " source TEXT NOT NULL, fingerprint TEXT NOT NULL, added_at TEXT NOT NULL,"
+            " PRIMARY KEY (source, fingerprint)) WITHOUT ROWID"
+        )
+
+    def load(self, source):
+        with self._lock:
+            rows = self.conn.execute("SELECT fingerprint FROM fingerprints WHERE source = ?", (source,))
+            return {r[0] for r in rows}
+
+    def add(self, source, fingerprints):
+        """Record fingerprints for `source`; returns how many were new."""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            before = self.conn.total_changes
+            self.conn.execute("BEGIN")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO fingerprints (source, fingerprint, added_at) VALUES (?, ?, ?)",
+                [(source, fp, now) for fp in fingerprints],
+            )
+            self.conn.execute("COMMIT")
+            return self.conn.total_changes - before
+
+    def count(self, source=None):
+        with self._lock:
+            if source is None:
+                return self.conn.execute("SELECT COUNT(*) FROM fingerprints").fetchone()[0]
+            return self.conn.execute("SELECT COUNT(*) FROM fingerprints WHERE source = ?", (source,)).fetchone()[0]
+
+    def known(self, source, fingerprints):
+        """Subset of `fingerprints` already recorded for `source` (one query per batch)."""
+        fingerprints = list(fingerprints)
+        found = set()
+        with self._lock:
+            for i in range(0, len(fingerprints), 500):
+                chunk = fingerprints[i:i + 500]
+                marks = ", ".join("?" for _ in chunk)
+                found.update(r[0] for r in self.conn.execute(
+                    f"SELECT fingerprint FROM fingerprints WHERE source = ? AND fingerprint IN ({marks})",
+                    [source] + chunk,
+                ))
+        return found
+
+    def seed(self, source, enriched_rows, source_type=None):
+        """Merge fingerprints found in an enriched sheet (hidden column, or recomputed for
+        rows written before the column existed) and return the full set for `source`."""
+        self.add(source, [row.get(FINGERPRINT_COLUMN) or fingerprint(row, source_type) for row in enriched_rows])
+        return self.load(source)
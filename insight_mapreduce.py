@@ -0,0 +1,176 @@
+# insight_mapreduce.py
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from llm_cache import get_cache
+from llm_engine import EnrichmentEngine, count_tokens
+
+# -----------------------------
+# Token-aware evidence for the executive insight prompt
+# -----------------------------
+# Small corpora go into the final prompt verbatim. Larger ones are split into shards
+# (source x month), each shard is condensed to a partial summary (hierarchically, when
+# a shard itself exceeds the map budget), and the summaries are condensed again until
+# they fit the final prompt. Shard summaries are stored by content hash, so a rerun
+# only recomputes shards whose rows changed.
+INSIGHTS_MODE = os.getenv("INSIGHTS_MODE", "auto").lower()  # auto | mapreduce | single
+MAP_OUTPUT_TOKENS = 700
+# Room for at least three partial summaries per call, so every reduce level shrinks
+MAP_INPUT_TOKENS = max(int(os.getenv("INSIGHTS_MAP_TOKENS", "6000")), 3 * MAP_OUTPUT_TOKENS)
+EVIDENCE_TOKENS = int(os.getenv("INSIGHTS_EVIDENCE_TOKENS", "12000"))
+MODEL = "gpt-4o-mini"
+SHARD_STORE_DIR = os.getenv(
+    "INSIGHT_SHARDS_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "insight_shards"),
+)
+# Candidate date columns across the enriched sheets, in order of preference
+DATE_FIELDS = ("Date", "date", "review_date", "published_at", "retrieved_at")
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%y", "%m/%d/%Y", "%b %d, %Y", "%B %d, %Y", "%d %b %Y")
+
+MAP_PROMPT_VERSION = "1"
+MAP_PROMPT = """
+You are condensing product-analysis notes about the competitor product Philips OptiChamber Diamond valved holding chamber
+({label}). Merge the notes below into concise bullet points, keeping concrete details and how often each point occurs:
+- competitor strengths and weaknesses
+- user pain points, praises and feature gaps
+- frequent keywords and phrases
+- marketing angles and market gaps
+- regulatory notes (FDA, recalls, approvals, regulations)
+Notes:
+{notes}
+"""
+
+
+# -----------------------------
+# Sharding
+# -----------------------------
+def _period(row):
+    for field in DATE_FIELDS:
+        value = str(row.get(field) or "").strip()
+        if not value:
+            continue
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).strftime("%Y-%m")
+        except ValueError:
+            pass
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(value, fmt).strftime("%Y-%m")
+            except ValueError:
+                continue
+    return "undated"
+
+def build_shards(rows_by_source):
+    """{source: [enriched rows]} -> {"source/YYYY-MM": [analysis texts]}."""
+    shards = {}
+    for source, rows in rows_by_source.items():
+        for row in rows:
+            text = str(row.get("enriched_analysis") or "").strip()
+            if text:
+                shards.setdefault(f"{source}/{_period(row)}", []).append(text)
+    return shards
+
+def shard_hash(texts):
+    digest = hashlib.sha256(f"{MODEL}|{MAP_PROMPT_VERSION}".encode("utf-8"))
+    for text in sorted(texts):
+        digest.update(b"\x1e" + text.encode("utf-8"))
+    return digest.hexdigest()
+
+def chunk_by_tokens(texts, budget):
+    """Split texts into consecutive groups of at most `budget` tokens (an oversized text goes alone)."""
+    groups, current, used = [], [], 0
+    for text in texts:
+        n = count_tokens(text, MODEL)
+        if current and used + n > budget:
+            groups.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += n
+    if current:
+        groups.append(current)
+    return groups
+
+
+# -----------------------------
+# Map / reduce
+# -----------------------------
+def _map_request(label, texts):
+    return dict(
+        model=MODEL,
+        messages=[{"role": "user", "content": MAP_PROMPT.format(label=label, notes="\n---\n".join(texts))}],
+        temperature=0.0,
+        max_tokens=MAP_OUTPUT_TOKENS,
+    )
+
+def condense(groups_by_key, engine):
+    """{key: texts} -> {key: one summary}, summarizing token-bounded groups level by level."""
+    current, done = dict(groups_by_key), {}
+    while current:
+        jobs = [(key, group) for key, texts in current.items() for group in chunk_by_tokens(texts, MAP_INPUT_TOKENS)]
+        results = engine.run_sync(_map_request(key, group) for key, group in jobs)
+        partial = {}
+        for (key, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                raise RuntimeError(f"Summarizing {key} failed: {result}") from result
+            partial.setdefault(key, []).append(result.strip())
+        current = {}
+        for key, summaries in partial.items():
+            if len(summaries) == 1:
+                done[key] = summaries[0]
+            else:
+                current[key] = summaries
+    return done
+
+
+class ShardStore:
+    """{shard_id: {"hash", "summary", "updated_at"}} persisted as one JSON file per namespace
+    (each job that builds evidence over its own corpus keeps its own shards)."""
+
+    def __init__(self, namespace="corpus", root=SHARD_STORE_DIR):
+        self.path = os.path.join(root, f"{namespace}.json")
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.shards = json.load(f)
+        except (OSError, ValueError):
+            self.shards = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.shards, f, indent=2, ensure_ascii=False)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def summarize_shards(shards, engine=None, store=None):
+    """Return {shard_id: summary}, recomputing only shards whose content hash changed."""
+    engine = engine or EnrichmentEngine(cache=get_cache())
+    store = store or ShardStore()
+    hashes = {sid: shard_hash(texts) for sid, texts in shards.items()}
+    changed = {sid: texts for sid, texts in shards.items() if store.shards.get(sid, {}).get("hash") != hashes[sid]}
+    print(f"🧩 {len(shards)} shards, {len(changed)} changed since the last run.")
+    now = datetime.now(timezone.utc).isoformat()
+    for sid, summary in condense(changed, engine).items():
+        store.shards[sid] = {"hash": hashes[sid], "summary": summary, "updated_at": now}
+    store.shards = {sid: v for sid, v in store.shards.items() if sid in shards}
+    store.save()
+    return {sid: store.shards[sid]["summary"] for sid in sorted(shards)}
+
+def build_evidence(rows_by_source, namespace="corpus", budget=EVIDENCE_TOKENS, mode=INSIGHTS_MODE):
+    """Text for the final insight prompt, guaranteed to fit `budget` tokens (unless mode=single)."""
+    shards = build_shards(rows_by_source)
+    combined = "\n".join(t for texts in shards.values() for t in texts)
+    if mode == "single" or (mode == "auto" and count_tokens(combined, MODEL) <= budget):
+        return combined
+
+    engine = EnrichmentEngine(cache=get_cache())
+    shard_summaries = summarize_shards(shards, engine, ShardStore(namespace))
+    summaries = [f"[{sid}]\n{summary}" for sid, summary in shard_summaries.items()]
+    # Final reduce: keep condensing the shard summaries until they fit the prompt budget
+    while count_tokens("\n\n".join(summaries), MODEL) > budget and len(summaries) > 1:
+        groups = chunk_by_tokens(summaries, MAP_INPUT_TOKENS)
+        merged = condense({f"corpus part {i + 1}": g for i, g in enumerate(groups)}, engine)
+        summaries = [merged[key] for key in sorted(merged, key=lambda k: int(k.rsplit(" ", 1)[1]))]
+    return "\n\n".join(summaries)
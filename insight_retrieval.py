@@ -0,0 +1,185 @@
+# insight_retrieval.py
+
+import json
+import os
+
+from langchain.docstore.document import Document
+
+from fingerprints import FINGERPRINT_COLUMN
+from insight_mapreduce import DATE_FIELDS
+from llm_cache import get_cache
+from llm_engine import EnrichmentEngine, count_tokens
+from vector_store import add_new_documents, embeddings_for
+
+# -----------------------------
+# Retrieval-targeted insight builder
+# -----------------------------
+# Every output section gets its own query against a FAISS index of enriched rows and a
+# prompt built from the top-k evidence only, so prompt size does not grow with the
+# corpus. The section calls run concurrently.
+ENRICHED_INDEX = "enriched"
+TOP_K = int(os.getenv("INSIGHTS_TOP_K", "12"))
+SECTION_EVIDENCE_TOKENS = int(os.getenv("INSIGHTS_SECTION_TOKENS", "4000"))
+MODEL = "gpt-4o-mini"
+
+FIVE = ["...", "...", "...", "...", "..."]
+SECTIONS = [
+    {
+        "path": ("executive_summary",),
+        "query": "overall perception of Philips OptiChamber Diamond, competitor activity and market dynamics",
+        "instruction": "Write a high-level overview of the competitor's perception, activity and market dynamics.",
+        "shape": "overview text",
+    },
+    {
+        "path": ("competitor_insights",),
+        "query": "strengths and weaknesses users mention about the OptiChamber Diamond spacer",
+        "instruction": "List the competitor's 5 key strengths and 5 weaknesses as users describe them.",
+        "shape": [{"competitor": "Name of competitor", "strengths": FIVE, "weaknesses": FIVE}],
+    },
+    {
+        "path": ("recommendations_for_product_manager",),
+        "query": "feature gaps, defects, unmet needs and product improvement opportunities for valved holding chambers",
+        "instruction": "Give the top 5 specific product development or strategy recommendations for our product, "
+                       "based on the competitor's gaps, opportunities and user feedback.",
+        "shape": FIVE,
+    },
+    {
+        "path": ("recommendations_for_marketing_team", "campaign_themes"),
+        "query": "themes users care about: durability, portability, price, ease of use, use with children",
+        "instruction": "Give the top 5 themes or narratives for marketing campaigns such as newsletters.",
+        "shape": FIVE,
+    },
+    {
+        "path": ("recommendations_for_marketing_team", "keywords"),
+        "query": "frequent words, phrases and hashtags people use about spacers and inhaler chambers",
+        "instruction": "Give the top 5 high-frequency words, hashtags or phrases worth leveraging.",
+        "shape": FIVE,
+    },
+    {
+        "path": ("recommendations_for_marketing_team", "Marketing_campaign"),
+        "query": "education needs and questions about inhaler technique and asthma management",
+        "instruction": "Give the top 5 newsletter topics, with details.",
+        "shape": FIVE,
+    },
+    {
+        "path": ("recommendations_for_marketing_team", "pain_points"),
+        "query": "user frustrations, complaints and unmet needs with inhaler spacers for asthma",
+        "instruction": "Give the top 5 frustrations or unmet needs marketing can address in asthma management messaging.",
+        "shape": FIVE,
+    },
+    {
+        "path": ("recommendations_for_marketing_team", "market_gaps"),
+        "query": "where the OptiChamber Diamond is weak or user needs are not being met",
+        "instruction": "Give the top 5 opportunities where the competitor is weak or user needs are not met.",
+        "shape": FIVE,
+    },
+    {
+        "path": ("regulatory_notes",),
+        "query": "FDA approvals, clearances, recalls and regulations for Philips Respironics OptiChamber",
+        "instruction": "Summarize FDA updates, recall issues, new approvals to track and compliance reminders "
+                       "for the competitor product.",
+        "shape": {"FDA": "...", "recalls": "...", "approvals": "...", "regulations": "..."},
+    },
+]
+
+SECTION_PROMPT = """
+You are an AI analyst helping a product team with competitive analysis. The competitor product is the Philips
+OptiChamber Diamond valved holding chamber (do not confuse it with other Philips products); our product is the
+AEROCHAMBER PLUS* FLOW-VU* Chamber.
+Task: {instruction}
+Base the answer on the evidence below (the most relevant enriched reviews, Reddit posts and web summaries) and
+do not invent facts it does not support.
+Return a JSON object of the form {shape}.
+Evidence:
+{evidence}
+"""
+
+
+# -----------------------------
+# Index of enriched rows
+# -----------------------------
+def sync_enriched_index(rows_by_source, embeddings=None):
+    """Add enriched rows that are not indexed yet; returns the store (None if there is nothing)."""
+    docs = []
+    for source, rows in rows_by_source.items():
+        for row in rows:
+            text = str(row.get("enriched_analysis") or "").strip()
+            if not text:
+                continue
+            date = next((str(row[f]) for f in DATE_FIELDS if row.get(f)), "")
+            docs.append(Document(page_content=text, metadata={
+                "source": source, "fingerprint": row.get(FINGERPRINT_COLUMN, ""), "date": date,
+            }))
+    store, added = add_new_documents(docs, index_name=ENRICHED_INDEX, embeddings=embeddings)
+    print(f"🧭 Enriched index: {added} new rows embedded.")
+    return store
+
+
+# -----------------------------
+# Sections
+# -----------------------------
+def retrieve(store, embeddings, k=TOP_K):
+    """Top-k (diversified) evidence per section; all queries embedded in one call."""
+    vectors = embeddings.embed_documents([s["query"] for s in SECTIONS])
+    evidence = []
+    for vector in vectors:
+        docs = store.max_marginal_relevance_search_by_vector(vector, k=k, fetch_k=4 * k)
+        picked, used = [], 0
+        for doc in docs:
+            used += count_tokens(doc.page_content, MODEL)
+            if picked and used > SECTION_EVIDENCE_TOKENS:
+                break
+            picked.append(doc)
+        evidence.append(picked)
+    return evidence
+
+def section_request(section, docs):
+    key = section["path"][-1]
+    evidence = "\n---\n".join(f"[{d.metadata.get('source', '')} {d.metadata.get('date', '')}]\n{d.page_content}"
+                              for d in docs)
+    prompt = SECTION_PROMPT.format(
+        instruction=section["instruction"],
+        shape=json.dumps({key: section["shape"]}),
+        evidence=evidence,
+    )
+    return dict(
+        model=MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        max_tokens=900,
+        response_format={"type": "json_object"},
+    )
+
+def build_insights(rows_by_source, k=TOP_K, embeddings=None):
+    """Return the insight document assembled from per-section calls.
+
+    Returns None when there is no data or when any section failed, so a partial (or
+    empty, e.g. during an API outage) document never replaces the current insights.
+    """
+    embeddings = embeddings or embeddings_for(ENRICHED_INDEX)
+    store = sync_enriched_index(rows_by_source, embeddings)
+    if store is None:
+        return None
+    evidence = retrieve(store, embeddings, k)
+    engine = EnrichmentEngine(cache=get_cache())
+    results = engine.run_sync(section_request(s, docs) for s, docs in zip(SECTIONS, evidence))
+
+    insights, failed = {}, []
+    for section, result in zip(SECTIONS, results):
+        key = section["path"][-1]
+        try:
+            value = json.loads(result)[key]
+        except Exception as e:
+            failed.append(".".join(section["path"]))
+            print(f"⚠️ Section {failed[-1]} failed: {result if isinstance(result, Exception) else e}")
+            continue
+        target = insights
+        for part in section["path"][:-1]:
+            target = target.setdefault(part, {})
+        target[key] = value
+    print(f"📊 Section calls: {engine.stats}")
+    if failed or not insights:
+        print(f"❌ {len(failed)}/{len(SECTIONS)} sections failed ({', '.join(failed) or 'empty result'}); "
+              f"keeping the current insights.")
+        return None
+    return insights
@@ -0,0 +1,143 @@
+# insights_history.py
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# -----------------------------
+# Append-only, versioned insight history
+# -----------------------------
+# One JSON record per line:
+# {"version": 7, "content_hash": "...", "written_at": "...", "source": "...", "insights": {...}}
+HISTORY_PATH = os.getenv(
+    "INSIGHTS_HISTORY_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "insights_history.jsonl"),
+)
+
+
+def content_hash(insights):
+    canonical = json.dumps(insights, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class InsightHistory:
+    """Monotonic version ids over an append-only JSONL file.
+
+    Writers (the LLM scripts and the backend) may share the file; records appended by
+    other processes are picked up on the next call.
+    """
+
+    def __init__(self, path=HISTORY_PATH):
+        self.path = path
+        # The backend's rollback pin lives beside the history so it survives restarts and
+        # every worker serves the same version
+        self.pin_path = os.path.splitext(path)[0] + ".pin.json"
+        self._lock = threading.Lock()
+        self._offsets = {}   # version -> byte offset of its line
+        self._meta = []      # [{version, content_hash, written_at, source}] in file order
+        self._scanned = 0    # bytes of the file already indexed
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    # -----------------------------
+    # Index maintenance
+    # -----------------------------
+    def _catch_up(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._scanned)
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line or not line.endswith(b"\n"):
+                    break  # EOF or a line still being written
+                record = json.loads(line)
+                self._offsets[record["version"]] = offset
+                self._meta.append({k: record.get(k) for k in ("version", "content_hash", "written_at", "source")})
+                self._scanned = f.tell()
+
+    # -----------------------------
+    # Public API
+    # -----------------------------
+    def latest_version(self):
+        with self._lock:
+            self._catch_up()
+            return self._meta[-1]["version"] if self._meta else 0
+
+    def versions(self, limit=50):
+        with self._lock:
+            self._catch_up()
+            return list(reversed(self._meta[-limit:]))
+
+    def get(self, version):
+        """Return the full record for `version`, or None if it was never written."""
+        with self._lock:
+            self._catch_up()
+            offset = self._offsets.get(version)
+        if offset is None:
+            return None
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def append(self, insights, source=""):
+        """Record `insights` and return its version. Unchanged content keeps the latest version."""
+        digest = content_hash(insights)
+        with self._lock, open(self.path, "a+b") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                if self._meta and self._meta[-1]["content_hash"] == digest:
+                    return self._meta[-1]["version"]
+                version = (self._meta[-1]["version"] if self._meta else 0) + 1
+                record = {
+                    "version": version,
+                    "content_hash": digest,
+                    "written_at": datetime.now(timezone.utc).isoformat(),
+                    "source": source,
+                    "insights": insights,
+                }
+                f.seek(0, os.SEEK_END)
+                f.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+                f.flush()
+                os.fsync(f.fileno())
+                self._catch_up()
+                return version
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def pinned_version(self):
+        """The version the backend is pinned to, or None when it serves the live sheet."""
+        try:
+            with open(self.pin_path, encoding="utf-8") as f:
+                return json.load(f).get("version")
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def pin(self, version):
+        """Pin the backend to `version` (None to unpin); written atomically."""
+        tmp = f"{self.pin_path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": version, "pinned_at": datetime.now(timezone.utc).isoformat()}, f)
+        os.replace(tmp, self.pin_path)
+
+
+def record_insights(insights, source=""):
+    """Normalize a raw LLM insight object to the served schema and append it.
+
+    Storing the same shape the backend serves lets both sides agree on content hashes,
+    so a pipeline write and the backend's next refresh share one version id.
+    """
+    from backend.insights_model import parse_insight_document
+
+    normalized = parse_insight_document(insights).model_dump(mode="json")
+    return InsightHistory().append(normalized, source=source)
@@ -0,0 +1,26 @@
+# insights_notify.py
+
+import os
+import requests
+
+# -----------------------------
+# Tell the backend that llm_insights changed
+# -----------------------------
+# INSIGHTS_NOTIFY_URL points at the backend refresh route, e.g.
+# https://ai-competitive-insights.herokuapp.com/api/insights/refresh
+def notify_insights_updated():
+    """Ask the backend to refresh now so dashboards get the new version over the change stream."""
+    url = os.getenv("INSIGHTS_NOTIFY_URL")
+    if not url:
+        return
+    headers = {}
+    token = os.getenv("INSIGHTS_REFRESH_TOKEN")
+    if token:
+        headers["X-Refresh-Token"] = token
+    try:
+        resp = requests.post(url, headers=headers, timeout=15)
+        resp.raise_for_status()
+        print(f"📣 Backend notified, insights version {resp.json().get('version')}")
+    except Exception as e:
+        # The backend's periodic refresh still picks the change up
+        print(f"⚠️ Could not notify backend: {e}")
@@ -0,0 +1,294 @@
+# llm_batch.py
+#
+# Nightly enrichment through the OpenAI Batch API (half price, 24h window):
+#
+#   python llm_batch.py submit          # write pending prompts to JSONL, submit, exit
+#   python llm_batch.py poll [--wait]   # merge finished batches into the *_enriched sheets
+#   python llm_batch.py status
+#
+# LLM_BATCH_BACKEND=local (or --local) swaps in a file-based stand-in that needs no API.
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+BATCH_DIR = os.getenv(
+    "LLM_BATCH_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "batches"),
+)
+BATCH_BACKEND = os.getenv("LLM_BATCH_BACKEND", "openai").lower()
+BATCH_MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", "50000"))  # API limit per file
+BATCH_ENDPOINT = "/v1/chat/completions"
+OPEN_STATES = {"validating", "in_progress", "finalizing", "cancelling"}
+# Terminal states; all but "completed" may still carry partial (already billed) output
+DONE_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+# -----------------------------
+# Batch file format
+# -----------------------------
+def write_request_file(path, requests):
+    """Write {custom_id: create() kwargs} as Batch API input lines."""
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests.items():
+            line = {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+            f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+def read_output_file(path):
+    """Return {custom_id: message content} for successful lines and {custom_id: error} for the rest."""
+    results, errors = {}, {}
+    if not os.path.exists(path):
+        return results, errors
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                errors[item["custom_id"]] = item.get("error") or response.get("body")
+                continue
+            results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results, errors
+
+
+# -----------------------------
+# Backends
+# -----------------------------
+class OpenAIBatchBackend:
+    name = "openai"
+
+    def __init__(self, client=None):
+        from openai import OpenAI
+        self.client = client or OpenAI()
+
+    def submit(self, path, metadata=None):
+        with open(path, "rb") as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT, completion_window="24h",
+            metadata=metadata or {},
+        )
+        return batch.id
+
+    def status(self, batch_id):
+        return self.client.batches.retrieve(batch_id).status
+
+    def download(self, batch_id, path):
+        """Write the output and error files (whichever exist) to `path`; False if there are none."""
+        batch = self.client.batches.retrieve(batch_id)
+        if not (batch.output_file_id or batch.error_file_id):
+            return False
+        with open(path, "w", encoding="utf-8") as f:
+            # Failed requests land in a separate error file with the same line format
+            for file_id in (batch.output_file_id, batch.error_file_id):
+                if file_id:
+                    f.write(self.client.files.content(file_id).text)
+        return True
+
+
+def _stub_completion(body):
+    prompt = "".join(m.get("content") or "" for m in body.get("messages", []))
+    return json.dumps({"sentiment": "neutral", "echo_chars": len(prompt)})
+
+class LocalBatchBackend:
+    """File-based stand-in: a batch is a directory that "completes" `delay` seconds after
+    submission, answering each line with `responder(body) -> content`."""
+
+    name = "local"
+
+    def __init__(self, root=os.path.join(BATCH_DIR, "local"), responder=_stub_completion, delay=0.0):
+        self.root, self.responder, self.delay = root, responder, delay
+
+    def submit(self, path, metadata=None):
+        batch_id = f"batch_local_{uuid.uuid4().hex[:12]}"
+        os.makedirs(os.path.join(self.root, batch_id))
+        shutil.copy(path, os.path.join(self.root, batch_id, "input.jsonl"))
+        with open(os.path.join(self.root, batch_id, "submitted_at"), "w") as f:
+            f.write(str(time.time()))
+        return batch_id
+
+    def status(self, batch_id):
+        folder = os.path.join(self.root, batch_id)
+        if os.path.exists(os.path.join(folder, "output.jsonl")):
+            return "completed"
+        with open(os.path.join(folder, "submitted_at")) as f:
+            if time.time() - float(f.read()) < self.delay:
+                return "in_progress"
+        with open(os.path.join(folder, "input.jsonl"), encoding="utf-8") as src, \
+                open(os.path.join(folder, "output.jsonl"), "w", encoding="utf-8") as out:
+            for line in src:
+                item = json.loads(line)
+                body = {"choices": [{"index": 0, "message": {"role": "assistant",
+                                                              "content": self.responder(item["body"])}}]}
+                out.write(json.dumps({"id": f"resp_{uuid.uuid4().hex[:8]}", "custom_id": item["custom_id"],
+                                      "response": {"status_code": 200, "body": body}, "error": None}) + "\n")
+        return "completed"
+
+    def download(self, batch_id, path):
+        output = os.path.join(self.root, batch_id, "output.jsonl")
+        if not os.path.exists(output):
+            return False
+        shutil.copy(output, path)
+        return True
+
+
+def get_backend(name=BATCH_BACKEND):
+    return LocalBatchBackend() if name == "local" else OpenAIBatchBackend()
+
+
+# -----------------------------
+# Jobs (one directory per submitted batch, so no process has to stay open)
+# -----------------------------
+def _job_dir(job_id):
+    return os.path.join(BATCH_DIR, job_id)
+
+def _save_manifest(manifest):
+    path = os.path.join(_job_dir(manifest["job_id"]), "manifest.json")
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+def list_jobs():
+    if not os.path.isdir(BATCH_DIR):
+        return []
+    manifests = []
+    for name in sorted(os.listdir(BATCH_DIR)):
+        path = os.path.join(BATCH_DIR, name, "manifest.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                manifests.append(json.load(f))
+    return manifests
+
+def pending_custom_ids():
+    """custom_ids already submitted in batches that have not been merged yet."""
+    ids = set()
+    for manifest in list_jobs():
+        if manifest["status"] != "merged":
+            with open(os.path.join(_job_dir(manifest["job_id"]), "records.jsonl"), encoding="utf-8") as f:
+                ids.update(json.loads(line)["custom_id"] for line in f)
+    return ids
+
+def submit_job(items, backend):
+    """Submit [(custom_id, target, record, request)] as one batch; returns the manifest."""
+    job_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "_" + uuid.uuid4().hex[:6]
+    os.makedirs(_job_dir(job_id))
+    write_request_file(os.path.join(_job_dir(job_id), "requests.jsonl"),
+                       {custom_id: request for custom_id, _, _, request in items})
+    with open(os.path.join(_job_dir(job_id), "records.jsonl"), "w", encoding="utf-8") as f:
+        for custom_id, target, record, _ in items:
+            f.write(json.dumps({"custom_id": custom_id, "target": target, "record": record}, ensure_ascii=False) + "\n")
+    batch_id = backend.submit(os.path.join(_job_dir(job_id), "requests.jsonl"), metadata={"job_id": job_id})
+    manifest = {"job_id": job_id, "backend": backend.name, "batch_id": batch_id, "status": "submitted",
+                "requests": len(items), "submitted_at": datetime.now(timezone.utc).isoformat()}
+    _save_manifest(manifest)
+    return manifest
+
+def collect_job(manifest, backend, merge):
+    """If the batch finished, merge its results via merge(target, [(record, content)]).
+
+    Failed, expired and cancelled batches are collected too: whatever output they have
+    was paid for. Returns the manifest with its updated status. Requests that errored or
+    never ran are not merged, so they are picked up by the next submit.
+    """
+    from llm_cache import get_cache
+
+    status = backend.status(manifest["batch_id"])
+    if status in OPEN_STATES:
+        return manifest
+    folder = _job_dir(manifest["job_id"])
+    if status in DONE_STATES:
+        backend.download(manifest["batch_id"], os.path.join(folder, "output.jsonl"))
+    results, errors = read_output_file(os.path.join(folder, "output.jsonl"))
+
+    cache = get_cache()
+    with open(os.path.join(folder, "requests.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            if item["custom_id"] in results:
+                cache.put(item["body"], results[item["custom_id"]])
+
+    by_target = {}
+    with open(os.path.join(folder, "records.jsonl"), encoding="utf-8") as f:
+        for line in f:
+            item = json.loads(line)
+            if item["custom_id"] in results:
+                by_target.setdefault(item["target"], []).append((item["record"], results[item["custom_id"]]))
+    for target, pairs in by_target.items():
+        merge(target, pairs)
+
+    manifest.update(status="merged", batch_status=status, succeeded=len(results), failed=len(errors),
+                    merged_at=datetime.now(timezone.utc).isoformat())
+    _save_manifest(manifest)
+    return manifest
+
+
+# -----------------------------
+# Enrichment glue
+# -----------------------------
+def submit_enrichment(backend, limit=None):
+    from llm_enrich_and_aggregate import SOURCES, enrichment_request, pending_rows
+    from fingerprints import FINGERPRINT_COLUMN
+    from sheets_helper import load_sheets
+
+    snapshot = load_sheets([name for source in SOURCES for name in source[:2]])
+    already_submitted = pending_custom_ids()
+    items = []
+    for sheet_name, enriched_name, source_type, dedupe_key in SOURCES:
+        for record in pending_rows(snapshot, sheet_name, enriched_name, source_type, dedupe_key, limit):
+            custom_id = f"{enriched_name}:{record[FINGERPRINT_COLUMN]}"
+            if custom_id not in already_submitted:
+                items.append((custom_id, enriched_name, record, enrichment_request(record, source_type)))
+    if not items:
+        print("✅ Nothing new to enrich.")
+        return []
+    manifests = [submit_job(items[i:i + BATCH_MAX_REQUESTS], backend)
+                 for i in range(0, len(items), BATCH_MAX_REQUESTS)]
+    for m in manifests:
+        print(f"📤 Submitted {m['requests']} requests as {m['batch_id']} (job {m['job_id']}).")
+    return manifests
+
+def merge_enriched(target, pairs):
+    from llm_enrich_and_aggregate import write_enriched
+    from fingerprints import FINGERPRINT_COLUMN
+
+    rows = [{**record, "enriched_analysis": content} for record, content in pairs]
+    headers = [h for h in rows[0] if h not in (FINGERPRINT_COLUMN, "enriched_analysis")] + ["enriched_analysis"]
+    write_enriched(target, rows, headers)
+    print(f"✅ Merged {len(rows)} enriched rows into {target}.")
+
+def poll_enrichment(backend, wait=False, interval=60):
+    while True:
+        open_jobs = [m for m in list_jobs() if m["status"] != "merged" and m["backend"] == backend.name]
+        for manifest in open_jobs:
+            manifest = collect_job(manifest, backend, merge_enriched)
+            print(f"🔎 Job {manifest['job_id']}: {manifest.get('batch_status', 'in progress')}")
+        remaining = [m for m in list_jobs() if m["status"] != "merged" and m["backend"] == backend.name]
+        if not wait or not remaining:
+            return remaining
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch-mode LLM enrichment")
+    parser.add_argument("command", choices=["submit", "poll", "status"])
+    parser.add_argument("--local", action="store_true", help="use the file-based stand-in backend")
+    parser.add_argument("--wait", action="store_true", help="keep polling until every batch is merged")
+    parser.add_argument("--interval", type=float, default=60)
+    parser.add_argument("--limit", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == "status":
+        for m in list_jobs():
+            print(f"{m['job_id']}  {m['backend']:6}  {m['batch_id']}  {m['status']}  requests={m['requests']}")
+        sys.exit(0)
+    backend = get_backend("local" if args.local else BATCH_BACKEND)
+    if args.command == "submit":
+        submit_enrichment(backend, limit=args.limit)
+    else:
+        poll_enrichment(backend, wait=args.wait, interval=args.interval)
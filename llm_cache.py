@@ -0,0 +1,135 @@
+# llm_cache.py
+
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+# -----------------------------
+# Content-addressed cache of chat completions
+# -----------------------------
+# Key = sha256 of the canonical request (model, messages, temperature, max_tokens and
+# any other create() arguments), so an unchanged prompt is never paid for twice.
+LLM_CACHE_PATH = os.getenv(
+    "LLM_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "llm_cache.db"),
+)
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "512"))
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "").lower() in ("1", "true", "yes")
+
+
+def request_key(request):
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite response store with least-recently-used eviction past `max_mb`.
+
+    With bypass=True lookups always miss but fresh responses are still stored,
+    which refreshes the cached entries.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_mb=LLM_CACHE_MAX_MB, bypass=LLM_CACHE_BYPASS):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.bypass = bypass
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, response TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS ix_responses_last_used ON responses (last_used)")
+        self._size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, request):
+        if self.bypass:
+            self.stats["misses"] += 1
+            return None
+        key = request_key(request)
+        with self._lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+            self.conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.stats["hits"] += 1
+            return row[0]
+
+    def put(self, request, response):
+        if response is None:
+            return
+        key, now = request_key(request), time.time()
+        size = len(response.encode("utf-8")) + len(key)
+        with self._lock:
+            old = self.conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, request.get("model"), response, size, now, now),
+            )
+            self._size += size - (old[0] if old else 0)
+            self.stats["stores"] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache is under 90% of its budget."""
+        target = self.max_bytes * 0.9
+        self.conn.execute("BEGIN")
+        for key, size in self.conn.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            if self._size <= target:
+                break
+            self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._size -= size
+            self.stats["evictions"] += 1
+        self.conn.execute("COMMIT")
+
+    def summary(self):
+        count = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {**self.stats, "entries": count, "size_mb": round(self._size / 1024 / 1024, 2)}
+
+    def clear(self):
+        with self._lock:
+            self.conn.execute("DELETE FROM responses")
+            self._size = 0
+
+
+_cache = None
+
+def get_cache():
+    """Process-wide cache instance."""
+    global _cache
+    if _cache is None:
+        _cache = LLMCache()
+    return _cache
+
+
+def cached_completion(client, cache=None, **request):
+    """chat.completions.create(**request) through the cache; returns the message content."""
+    cache = cache or get_cache()
+    content = cache.get(request)
+    if content is None:
+        resp = client.chat.completions.create(**request)
+        content = resp.choices[0].message.content
+        cache.put(request, content)
+    return content
+
+
+if __name__ == "__main__":
+    # python llm_cache.py [stats|clear]
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    cache = get_cache()
+    if command == "clear":
+        cache.clear()
+        print("🧹 LLM cache cleared.")
+    else:
+        print(f"📊 {cache.summary()}")
@@ -0,0 +1,184 @@
+# llm_engine.py
+
+import asyncio
+import os
+import random
+import time
+
+import openai
+from openai import AsyncOpenAI
+
+# -----------------------------
+# Limits (match the account's tier; see the OpenAI "Limits" page)
+# -----------------------------
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "16"))
+LLM_RPM = float(os.getenv("LLM_RPM", "500"))
+LLM_TPM = float(os.getenv("LLM_TPM", "200000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+
+
+# -----------------------------
+# Token estimation
+# -----------------------------
+_encodings = {}
+
+def _encoding(model):
+    if model not in _encodings:
+        try:
+            import tiktoken
+            try:
+                _encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encodings[model] = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            # tiktoken missing, or its BPE files can't be downloaded (offline runs)
+            _encodings[model] = None
+    return _encodings[model]
+
+def count_tokens(text, model="gpt-4o-mini"):
+    enc = _encoding(model)
+    return len(enc.encode(text)) if enc else len(text) // 4 + 1
+
+def estimate_tokens(messages, model="gpt-4o-mini", max_tokens=0):
+    """Tokens a request counts against TPM: prompt tokens plus the completion budget."""
+    prompt = sum(4 + count_tokens(m.get("content") or "", model) for m in messages)
+    return prompt + 3 + (max_tokens or 0)
+
+
+# -----------------------------
+# Dual RPM / TPM limiter
+# -----------------------------
+class RateLimiter:
+    """Two token buckets refilled continuously (monotonic clock): one in requests, one in tokens.
+
+    A limiter outlives event loops, so it can span every run_sync() of a job.
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM):
+        self.rpm, self.tpm = rpm, tpm
+        self.requests, self.tokens = rpm, tpm  # start with a full minute of budget
+        self.updated = time.monotonic()
+        self._lock, self._loop = None, None
+
+    def _loop_lock(self):
+        # asyncio.Lock binds to one loop; run_sync() starts a new loop per call
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._lock, self._loop = asyncio.Lock(), loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed, self.updated = now - self.updated, now
+        self.requests = min(self.rpm, self.requests + elapsed * self.rpm / 60)
+        self.tokens = min(self.tpm, self.tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, tokens):
+        tokens = min(tokens, self.tpm)  # an oversized request waits for a full bucket, not forever
+        async with self._loop_lock():  # FIFO: later callers queue behind the one waiting
+            while True:
+                self._refill()
+                if self.requests >= 1 and self.tokens >= tokens:
+                    self.requests -= 1
+                    self.tokens -= tokens
+                    return
+                wait = max((1 - self.requests) * 60 / self.rpm, (tokens - self.tokens) * 60 / self.tpm)
+                await asyncio.sleep(max(wait, 0.01))
+
+    def pause(self, seconds):
+        """Back off everyone after a 429: drain the buckets for `seconds` worth of refill."""
+        self._refill()
+        self.requests -= seconds * self.rpm / 60
+        self.tokens -= seconds * self.tpm / 60
+
+
+_limiters = {}
+
+def get_rate_limiter(rpm=LLM_RPM, tpm=LLM_TPM):
+    """Process-wide limiter per (rpm, tpm): every engine and run shares one budget."""
+    return _limiters.setdefault((rpm, tpm), RateLimiter(rpm, tpm))
+
+
+# -----------------------------
+# Engine
+# -----------------------------
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        try:
+            if headers.get(header):
+                return float(headers[header]) * scale
+        except ValueError:
+            pass
+    return None
+
+class EnrichmentEngine:
+    """Runs many chat completions concurrently under a shared RPM/TPM budget.
+
+    Each request is a dict of chat.completions.create keyword arguments
+    (model, messages, temperature, max_tokens, ...). Results come back in input order;
+    a request that still fails after retries yields its exception in its slot.
+    With an llm_cache.LLMCache, cached requests are answered without an API call.
+    The RPM/TPM budget comes from the process-wide limiter unless one is passed in.
+    """
+
+    def __init__(self, client=None, concurrency=LLM_CONCURRENCY, rpm=LLM_RPM, tpm=LLM_TPM,
+                 max_retries=LLM_MAX_RETRIES, cache=None, limiter=None):
+        self.client = client
+        self.cache = cache
+        self.concurrency = concurrency
+        self.limiter = limiter or get_rate_limiter(rpm, tpm)
+        self.max_retries = max_retries
+        self.stats = {"requests": 0, "cached": 0, "retries": 0, "rate_limited": 0, "failed": 0}
+
+    async def _call(self, client, request, limiter, semaphore):
+        if self.cache is not None:
+            cached = self.cache.get(request)
+            if cached is not None:
+                self.stats["cached"] += 1
+                return cached
+        tokens = estimate_tokens(request["messages"], request.get("model", ""), request.get("max_tokens"))
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire(tokens)
+                self.stats["requests"] += 1
+                try:
+                    resp = await client.chat.completions.create(**request)
+                    content = resp.choices[0].message.content
+                    if self.cache is not None:
+                        self.cache.put(request, content)
+                    return content
+                except (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError,
+                        openai.InternalServerError) as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = _retry_after(e)
+                    if isinstance(e, openai.RateLimitError):
+                        self.stats["rate_limited"] += 1
+                        limiter.pause(delay or 1.0)
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(delay if delay is not None else random.uniform(0, min(60.0, 2 ** attempt)))
+
+    async def run(self, requests):
+        limiter = self.limiter
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # An async client is tied to the loop it first ran on, so one is made per run
+        # (retries are ours and limiter-aware, not the SDK's)
+        client = self.client or AsyncOpenAI(max_retries=0)
+
+        async def guarded(request):
+            try:
+                return await self._call(client, request, limiter, semaphore)
+            except Exception as e:
+                self.stats["failed"] += 1
+                return e
+
+        try:
+            return await asyncio.gather(*(guarded(r) for r in requests))
+        finally:
+            if self.client is None:
+                await client.close()
+
+    def run_sync(self, requests):
+        """Blocking wrapper for the (synchronous) pipeline scripts."""
+        return asyncio.run(self.run(list(requests)))
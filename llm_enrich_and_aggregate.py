@@ -3,32 +3,25 @@
 import os
 from dotenv import load_dotenv
 import gspread
-from google.oauth2.service_account import Credentials
 from openai import OpenAI
+from checkpoints import Checkpoints
+from fingerprints import FINGERPRINT_COLUMN, FingerprintIndex, fingerprint
+from insight_mapreduce import DATE_FIELDS, build_evidence
+from insights_history import record_insights
+from insights_notify import notify_insights_updated
+from llm_cache import cached_completion, get_cache
+from llm_engine import EnrichmentEngine, estimate_tokens
+from llm_packing import run_packed
+from sheets_helper import ensure_header, iter_records, open_ws
+from sheets_writer import MAX_ROWS_PER_CALL, append_rows_once, call_with_backoff, replace_rows
 import time
-import pandas as pd
 import json
+from itertools import islice
 
 # -----------------------------
 # Load environment variables
 # -----------------------------
 load_dotenv()
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
-    raise Exception("OPENAI_API_KEY not found in .env")
-print("OPENAI_API_KEY found: True")
-
-# -----------------------------
-# Google Sheets scopes and auth
-# -----------------------------
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-creds = Credentials.from_service_account_file(key_path, scopes=SCOPES)
-client = gspread.authorize(creds)
 
 # -----------------------------
 # Sheets info
@@ -42,62 +35,131 @@ REDDIT_ENRICHED = "reddit_discussions_enriched"
 SUMMARIES_ENRICHED = "webdata_summaries_enriched"
 INSIGHTS_SHEET = "llm_insights"
 
+# (source sheet, enriched sheet, source type, dedupe column)
+SOURCES = [
+    (REVIEWS_SHEET, REVIEWS_ENRICHED, "review", None),
+    (REDDIT_SHEET, REDDIT_ENRICHED, "reddit", "Title"),
+    (SUMMARIES_SHEET, SUMMARIES_ENRICHED, "summary", None),
+]
+
+# Packing: up to PACK_MAX_RECORDS rows per request, within PACK_TOKENS prompt tokens (1 = off)
+PACK_MAX_RECORDS = int(os.getenv("ENRICH_PACK_MAX_RECORDS", "20"))
+PACK_TOKENS = int(os.getenv("ENRICH_PACK_TOKENS", "3000"))
+PACK_OUTPUT_TOKENS_PER_RECORD = 350
+# Rows read, enriched and written per step of the streaming pipeline
+ENRICH_BATCH_SIZE = int(os.getenv("ENRICH_BATCH_SIZE", "100"))
+
 # -----------------------------
-# OpenAI client
+# OpenAI client (created on first use, so importing the helpers needs no API key)
 # -----------------------------
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+_openai_client = None
+
+def get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise Exception("OPENAI_API_KEY not found in .env")
+        print("OPENAI_API_KEY found: True")
+        _openai_client = OpenAI(api_key=api_key)
+    return _openai_client
 
 # -----------------------------
 # Helper functions
 # -----------------------------
-def fetch_sheet_data(sheet_name, limit=None):
-    try:
-        sheet = client.open(sheet_name).sheet1
-    except gspread.SpreadsheetNotFound:
-        raise Exception(f"Spreadsheet {sheet_name} not found. Create it manually and share with service account.")
-    data = sheet.get_all_records()
-    if limit:
-        return data[:limit]
-    return data
+def dedupe_by(rows, key):
+    """Drop rows whose `key` value was already seen (streaming drop_duplicates)."""
+    seen = set()
+    for row in rows:
+        value = row.get(key)
+        if value in seen:
+            continue
+        seen.add(value)
+        yield row
 
-def fetch_existing_enriched(sheet_name):
-    """Return list of already enriched row keys to skip"""
-    try:
-        sheet = client.open(sheet_name).sheet1
-        data = sheet.get_all_records()
-        if data:
-            return set([json.dumps(r, sort_keys=True) for r in data])
-        return set()
-    except gspread.SpreadsheetNotFound:
-        return set()
+fingerprint_index = FingerprintIndex()
 
-def write_enriched(sheet_name, data, headers, batch_size=10):
-    """Write enriched data in batches"""
-    try:
-        sheet = client.open(sheet_name).sheet1
-    except gspread.SpreadsheetNotFound:
-        sheet = client.create(sheet_name).sheet1
-        sheet.append_row(headers)
+def fetch_existing_enriched(sheet_name, rows=None, source_type=None):
+    """Return the fingerprints of already enriched rows to skip (from preloaded `rows` if given)"""
+    if rows is None:
+        try:
+            rows = iter_records(open_ws(sheet_name))
+        except gspread.SpreadsheetNotFound:
+            rows = []
+    return fingerprint_index.seed(sheet_name, rows, source_type)
 
-    # Convert list of dicts to list of lists
-    rows = [[row.get(h, "") for h in headers] for row in data]
+def rows_to_enrich(raw_rows, existing, source_type):
+    """Keep rows whose fingerprint is not in `existing`, tagging each with its fingerprint."""
+    pending = []
+    for r in raw_rows:
+        fp = fingerprint(r, source_type)
+        if fp not in existing:
+            existing.add(fp)  # also skips duplicates within this batch
+            pending.append({**r, FINGERPRINT_COLUMN: fp})
+    return pending
 
-    # Batch append
-    for i in range(0, len(rows), batch_size):
-        batch = rows[i:i + batch_size]
-        sheet.append_rows(batch, value_input_option="RAW")
+def pending_rows(snapshot, sheet_name, enriched_name, source_type, dedupe_key=None, limit=None):
+    """Rows of a loaded source sheet that still need enrichment (fingerprint-tagged)."""
+    raw = snapshot[sheet_name][:limit]
+    if dedupe_key:
+        raw = list(dedupe_by(raw, dedupe_key))
+    existing = fetch_existing_enriched(enriched_name, snapshot[enriched_name], source_type)
+    return rows_to_enrich(raw, existing, source_type)
 
-def write_insights(sheet_name, insight_json):
+def _hide_last_column(sheet, header):
+    if hasattr(sheet, "hide_columns"):
+        call_with_backoff(sheet.hide_columns, len(header) - 1, len(header))
+
+def write_enriched(sheet_name, data, headers):
+    """Append enriched data in as few rate-limited, retried calls as possible.
+
+    Returns the rows that reached the sheet; after a failed call the rest are left out.
+    """
+    headers = [h for h in headers if h != FINGERPRINT_COLUMN]
     try:
-        sheet = client.open(sheet_name).sheet1
+        sheet = open_ws(sheet_name)
+        existing_header = [h for h in sheet.row_values(1) if h]
+        if not existing_header:
+            append_rows_once(sheet, [headers])
+            existing_header = headers
+        if FINGERPRINT_COLUMN not in existing_header:
+            existing_header = existing_header + [FINGERPRINT_COLUMN]
+            ensure_header(sheet, existing_header)
+            _hide_last_column(sheet, existing_header)
+        headers = existing_header
     except gspread.SpreadsheetNotFound:
-        sheet = client.create(sheet_name).sheet1
-    sheet.clear()
-    sheet.append_row(list(insight_json.keys()))
-    sheet.append_row(list(insight_json.values()))
+        sheet = open_ws(sheet_name, create=True)
+        headers = headers + [FINGERPRINT_COLUMN]
+        append_rows_once(sheet, [headers])
+        _hide_last_column(sheet, headers)
 
-def enrich_with_llm(record, source_type):
-    """Enrich a single row with LLM"""
+    written = []
+    try:
+        for i in range(0, len(data), MAX_ROWS_PER_CALL):
+            chunk = data[i:i + MAX_ROWS_PER_CALL]
+            # Convert list of dicts to list of lists
+            append_rows_once(sheet, [[row.get(h, "") for h in headers] for row in chunk])
+            # Only rows that actually reached the sheet count as enriched
+            fingerprint_index.add(sheet_name, [row[FINGERPRINT_COLUMN] for row in chunk if row.get(FINGERPRINT_COLUMN)])
+            written.extend(chunk)
+    except Exception as e:
+        print(f"⚠️ Writing {len(data) - len(written)} rows to {sheet_name} failed: {e}")
+    return written
+
+def write_insights(sheet_name, insight_json):
+    sheet = open_ws(sheet_name, create=True)
+    # Nested sections are stored as JSON strings; the backend decodes them per cell
+    replace_rows(sheet, [
+        list(insight_json.keys()),
+        [v if isinstance(v, str) else json.dumps(v) for v in insight_json.values()],
+    ])
+    version = record_insights(insight_json, source="llm_enrich_and_aggregate")
+    print(f"🗂️ Insights recorded as history version {version}.")
+    notify_insights_updated()
+
+def enrichment_request(record, source_type):
+    """chat.completions.create arguments for enriching one row"""
+    source = {k: v for k, v in record.items() if k != FINGERPRINT_COLUMN}
     prompt = f"""
 You are an AI product analyst. Analyze the following {source_type} data and extract actionable insights for a Product Manager for their own product(AEROCHAMBER PLUS* FLOW-VU* Chamber) based on competitor product (Philips Respironics OptiChamber Diamond Spacer) .
 Return JSON with:
@@ -110,94 +172,189 @@ Return JSON with:
 - recommendations
 - regulatory_notes (FDA, recalls, approvals, regulations)
 Raw data:
-{record}
+{source}
 JSON output only.
 """
-    resp = openai_client.chat.completions.create(
+    return dict(
         model="gpt-4o-mini",
         messages=[{"role":"user", "content": prompt}],
         temperature=0.0,
         max_tokens=500
     )
-    enriched = resp.choices[0].message.content
-    return {**record, "enriched_analysis": enriched}
+
+def packed_enrichment_request(pack, source_type):
+    """chat.completions.create arguments for enriching several rows in one call"""
+    rows = [{"id": rid, **{k: v for k, v in record.items() if k != FINGERPRINT_COLUMN}} for rid, record in pack]
+    prompt = f"""
+You are an AI product analyst. Analyze each of the following {source_type} records and extract actionable insights for a Product Manager for their own product(AEROCHAMBER PLUS* FLOW-VU* Chamber) based on competitor product (Philips Respironics OptiChamber Diamond Spacer) .
+For every record return an object with its "id" and:
+- sentiment (positive/negative/neutral)
+- common_pains
+- common_praises
+- feature_gaps
+- competitor_mentions
+- opportunities
+- recommendations
+- regulatory_notes (FDA, recalls, approvals, regulations)
+Respond with a JSON object {{"results": [...]}} containing exactly one object per record id.
+Records:
+{json.dumps(rows, ensure_ascii=False, default=str)}
+"""
+    return dict(
+        model="gpt-4o-mini",
+        messages=[{"role":"user", "content": prompt}],
+        temperature=0.0,
+        max_tokens=min(16000, PACK_OUTPUT_TOKENS_PER_RECORD * len(pack)),
+        response_format={"type": "json_object"}
+    )
+
+def _record_tokens(record):
+    return estimate_tokens([{"content": json.dumps(record, ensure_ascii=False, default=str)}])
+
+def enrich_many(records, source_type, engine=None):
+    """Enrich rows concurrently (bounded, RPM/TPM limited, packed), keeping input order.
+
+    Rows whose call still fails after retries are left out; having no fingerprint
+    recorded, they are picked up again on the next run. Pass one `engine` for a whole job.
+    """
+    engine = engine or EnrichmentEngine(cache=get_cache())
+    if PACK_MAX_RECORDS > 1:
+        results = run_packed(
+            records, engine,
+            build_pack_request=lambda pack: packed_enrichment_request(pack, source_type),
+            build_single_request=lambda r: enrichment_request(r, source_type),
+            cost=_record_tokens, budget=PACK_TOKENS, max_records=PACK_MAX_RECORDS,
+        )
+    else:
+        results = engine.run_sync(enrichment_request(r, source_type) for r in records)
+    enriched = []
+    for record, result in zip(records, results):
+        if isinstance(result, Exception):
+            print(f"⚠️ Enrichment failed for a {source_type} row: {result}")
+            continue
+        enriched.append({**record, "enriched_analysis": result})
+    print(f"📊 {source_type}: {engine.stats}")
+    return enriched
+
+# -----------------------------
+# Streaming pipeline
+# -----------------------------
+checkpoints = Checkpoints()
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _seed_from_sheet(enriched_name, source_type):
+    """First run on this machine: import the fingerprints mirrored in the enriched sheet."""
+    if fingerprint_index.count(enriched_name):
+        return
+    try:
+        rows = iter_records(open_ws(enriched_name))
+        for chunk in chunked(rows, 1000):
+            fingerprint_index.add(enriched_name, [r.get(FINGERPRINT_COLUMN) or fingerprint(r, source_type) for r in chunk])
+    except gspread.SpreadsheetNotFound:
+        pass
+
+def _resume_row(sheet, sheet_name, source_type):
+    """First sheet row to read: after the checkpoint, if that row is still where we left it."""
+    row, fp = checkpoints.get(sheet_name)
+    if row < 2:
+        return 2
+    # A small page rather than one row: a blank checkpoint row makes the reader look ahead
+    probe_row, probe = next(iter_records(sheet, start_row=row, page_size=100, with_row=True), (None, None))
+    if probe_row == row and fingerprint(probe, source_type) == fp:
+        return row + 1
+    print(f"↩️ Checkpoint for {sheet_name} no longer matches row {row}; rescanning from the top.")
+    return 2
+
+def enrich_source(sheet_name, enriched_name, source_type, dedupe_key=None, limit=None, batch_size=ENRICH_BATCH_SIZE):
+    """Stream read → dedupe → enrich → write for one source, yielding each written batch.
+
+    Every batch is flushed to the enriched sheet before the source's checkpoint moves
+    past it, so a restarted run resumes where the last one stopped; memory stays
+    bounded by batch_size. The checkpoint never passes a row whose enrichment or
+    write failed.
+    """
+    try:
+        sheet = open_ws(sheet_name)
+    except gspread.SpreadsheetNotFound:
+        raise Exception(f"Spreadsheet {sheet_name} not found. Create it manually and share with service account.")
+    _seed_from_sheet(enriched_name, source_type)
+
+    rows = islice(iter_records(sheet, start_row=_resume_row(sheet, sheet_name, source_type), with_row=True), limit)
+    seen, stalled = set(), False
+    engine = EnrichmentEngine(cache=get_cache())  # one engine (and RPM/TPM budget) for every batch
+    for batch in chunked(rows, batch_size):
+        tagged = [(n, {**r, FINGERPRINT_COLUMN: fingerprint(r, source_type)}) for n, r in batch]
+        done = fingerprint_index.known(enriched_name, [r[FINGERPRINT_COLUMN] for _, r in tagged])
+        todo = []
+        for n, r in tagged:
+            key = r.get(dedupe_key) if dedupe_key else r[FINGERPRINT_COLUMN]
+            if r[FINGERPRINT_COLUMN] in done or key in seen:
+                continue
+            seen.add(key)
+            todo.append((n, r))
+
+        enriched = enrich_many([r for _, r in todo], source_type, engine) if todo else []
+        if enriched:
+            headers = [h for h in batch[0][1]] + ["enriched_analysis"]
+            enriched = write_enriched(enriched_name, enriched, headers)
+
+        written = {r[FINGERPRINT_COLUMN] for r in enriched}
+        failed = [n for n, r in todo if r[FINGERPRINT_COLUMN] not in written]
+        if not stalled:
+            fp_by_row = dict((n, r[FINGERPRINT_COLUMN]) for n, r in tagged)
+            last = failed[0] - 1 if failed else tagged[-1][0]
+            if last in fp_by_row:
+                checkpoints.set(sheet_name, last, fp_by_row[last])
+            stalled = bool(failed)
+        yield enriched
 
 # -----------------------------
 # Main enrichment logic
 # -----------------------------
 if __name__ == "__main__":
+    get_openai_client()  # fail fast without a key
     LIMIT = None  # for testing, set small number like 5
 
-    # Fetch raw Reddit data
-raw_reddit = fetch_sheet_data(REDDIT_SHEET, limit=LIMIT)
-
-# Deduplicate by Title
-import pandas as pd
-df_reddit = pd.DataFrame(raw_reddit).drop_duplicates(subset=['Title'])
-raw_reddit = df_reddit.to_dict(orient='records')
-print(f"✅ Deduplicated Reddit posts. Remaining rows: {len(raw_reddit)}")
-    # ---------- Reviews ----------
-raw_reviews = fetch_sheet_data(REVIEWS_SHEET, limit=LIMIT)
-existing_reviews = fetch_existing_enriched(REVIEWS_ENRICHED)
-    # Skip already enriched
-reviews_to_enrich = [r for r in raw_reviews if json.dumps(r, sort_keys=True) not in existing_reviews]
-enriched_reviews = [enrich_with_llm(r, "review") for r in reviews_to_enrich]
-if enriched_reviews:
-        write_enriched(REVIEWS_ENRICHED, enriched_reviews, list(raw_reviews[0].keys()) + ["enriched_analysis"])
-print(f"✅ Enrichment complete for {len(enriched_reviews)} review rows.")
-
-    # ---------- Reddit ----------
-     # Deduplicate Reddit posts based on Title only
-import pandas as pd
-
-df_reddit = pd.DataFrame(raw_reddit).drop_duplicates(subset=['Title'])
-raw_reddit = df_reddit.to_dict(orient='records')
-
-print(f"✅ Deduplicated Reddit posts. Remaining rows: {len(raw_reddit)}")
-
-raw_reddit = fetch_sheet_data(REDDIT_SHEET, limit=LIMIT)
-    # Deduplicate based on Title + Text
-df_reddit = pd.DataFrame(raw_reddit).drop_duplicates(subset=['Title'])
-raw_reddit = df_reddit.to_dict(orient='records')
-existing_reddit = fetch_existing_enriched(REDDIT_ENRICHED)
-reddit_to_enrich = [r for r in raw_reddit if json.dumps(r, sort_keys=True) not in existing_reddit]
-enriched_reddit = [enrich_with_llm(r, "reddit") for r in reddit_to_enrich]
-if enriched_reddit:
-        write_enriched(REDDIT_ENRICHED, enriched_reddit, list(raw_reddit[0].keys()) + ["enriched_analysis"])
-print(f"✅ Enrichment complete for {len(enriched_reddit)} reddit rows.")
-
-    # ---------- Summaries ----------
-raw_summaries = fetch_sheet_data(SUMMARIES_SHEET, limit=LIMIT)
-existing_summaries = fetch_existing_enriched(SUMMARIES_ENRICHED)
-summaries_to_enrich = [r for r in raw_summaries if json.dumps(r, sort_keys=True) not in existing_summaries]
-enriched_summaries = [enrich_with_llm(r, "summary") for r in summaries_to_enrich]
-if enriched_summaries:
-        write_enriched(SUMMARIES_ENRICHED, enriched_summaries, list(raw_summaries[0].keys()) + ["enriched_analysis"])
-print(f"✅ Enrichment complete for {len(enriched_summaries)} summary rows.")
+    # ---------- Reviews, Reddit, Summaries (streamed, checkpointed) ----------
+    enriched_by_source = {}
+    for sheet_name, enriched_name, source_type, dedupe_key in SOURCES:
+        enriched_count = 0
+        for batch in enrich_source(sheet_name, enriched_name, source_type, dedupe_key, limit=LIMIT):
+            enriched_count += len(batch)
+            # Keep only what the insight step needs
+            enriched_by_source.setdefault(source_type, []).extend(
+                {k: r[k] for k in ("enriched_analysis", *DATE_FIELDS) if k in r} for r in batch
+            )
+        print(f"✅ Enrichment complete for {enriched_count} {source_type} rows.")
 
     # ---------- Generate executive LLM Insights ----------
-all_enriched_text = "\n".join([
-        r["enriched_analysis"] for r in (enriched_reviews + enriched_reddit + enriched_summaries)
-    ])
-if all_enriched_text.strip():
+    all_enriched_text = build_evidence(enriched_by_source, namespace="latest_run")
+    if all_enriched_text.strip():
         insight_prompt = f"""
 You are an AI analyst helping a product team understand user and market insights for B2B and B2C market. Remember competitor product is Philips OptiChamber Diamond valved holding chamber.
 
 Based on the input data (reviews, Reddit posts, summaries), produce structured insights in JSON with the following fields:
 
-{
+{{
   "executive_summary": "High-level overview of product competitor perception, competitor activity, and market dynamics.",
   "competitor_insights": [
-    {
+    {{
       "competitor": "Name of competitor",
       "strengths": ["List of key strengths users mention"],
       "weaknesses": ["List of weaknesses or complaints users mention"]
-    }
+    }}
   ],
   "recommendations_for_our product manager for our product (Trudell medical internaltional AEROCHAMBER PLUS* FLOW-VU* Chamber)": [
     "Specific product development or strategic recommendations based on competitor gaps, opportunities, or user feedback."
   ],
-  "recommendations_for_marketing team": {
+  "recommendations_for_marketing team": {{
     "campaign_themes": [
       "Themes or narratives marketing can use (e.g., durability, portability, affordability)any specific keyword, user painpoint etc."
     ],
@@ -210,30 +367,31 @@ Based on the input data (reviews, Reddit posts, summaries), produce structured i
     "market_gaps": [
       "Opportunities where competitors (Philips OptiChamber Diamond valved holding chamber) is weak or user needs aren’t being met."
     ]
-  },
-  "regulatory_notes": {
+  }},
+  "regulatory_notes": {{
     "FDA": "Any relevant FDA approvals or recalls to monitor of competitor (Philips OptiChamber Diamond valved holding chamber)",
     "recalls": "Notable competitor recall issues",
     "approvals": "New treatment approvals to track of competitor (Philips OptiChamber Diamond valved holding chamber)",
     "regulations": "General compliance reminders of competitor (Philips OptiChamber Diamond valved holding chamber)"
-  }
-}
+  }}
+}}
 
 Ensure the JSON is valid and complete. Be concise but actionable.
 Return JSON only.
 Combined enriched data:
 {all_enriched_text}
 """
-        insight_resp = openai_client.chat.completions.create(
+        llm_insights = cached_completion(
+            get_openai_client(),
             model="gpt-4o-mini",
             messages=[{"role":"user","content": insight_prompt}],
             temperature=0.0,
             max_tokens=500
         )
-        llm_insights = insight_resp.choices[0].message.content
         try:
             llm_insights_json = json.loads(llm_insights)
         except:
             llm_insights_json = {"insights_raw": llm_insights}
         write_insights(INSIGHTS_SHEET, llm_insights_json)
         print(f"✅ LLM Insights written to {INSIGHTS_SHEET}.")
+    print(f"📊 LLM cache: {get_cache().summary()}")
@@ -3,9 +3,14 @@
 import os
 import json
 from dotenv import load_dotenv
-import gspread
-from google.oauth2.service_account import Credentials
 from openai import OpenAI
+from insight_mapreduce import DATE_FIELDS, build_evidence
+from fingerprints import FINGERPRINT_COLUMN
+from insights_history import record_insights
+from insights_notify import notify_insights_updated
+from llm_cache import cached_completion, get_cache
+from sheets_helper import load_sheets, open_ws
+from sheets_writer import replace_rows
 
 # -----------------------------
 # Load environment variables
@@ -16,18 +21,6 @@ if not OPENAI_API_KEY:
     raise Exception("OPENAI_API_KEY not found in .env")
 print("OPENAI_API_KEY found: True")
 
-# -----------------------------
-# Google Sheets scopes and auth
-# -----------------------------
-SCOPES = [
-    "https://www.googleapis.com/auth/spreadsheets",
-    "https://www.googleapis.com/auth/drive"
-]
-
-key_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-creds = Credentials.from_service_account_file(key_path, scopes=SCOPES)
-client = gspread.authorize(creds)
-
 # -----------------------------
 # Sheets info
 # -----------------------------
@@ -36,6 +29,9 @@ REDDIT_ENRICHED = "reddit_discussions_enriched"
 SUMMARIES_ENRICHED = "webdata_summaries_enriched"
 INSIGHTS_SHEET = "llm_insights"
 
+# retrieval: one top-k evidence prompt per section (bounded); corpus: whole corpus (map-reduced)
+INSIGHTS_BUILDER = os.getenv("INSIGHTS_BUILDER", "retrieval").lower()
+
 # -----------------------------
 # OpenAI client
 # -----------------------------
@@ -44,15 +40,6 @@ openai_client = OpenAI(api_key=OPENAI_API_KEY)
 # -----------------------------
 # Helper functions
 # -----------------------------
-def fetch_enriched(sheet_name):
-    """Fetch enriched data (list of dicts)."""
-    try:
-        sheet = client.open(sheet_name).sheet1
-        return sheet.get_all_records()
-    except gspread.SpreadsheetNotFound:
-        print(f"⚠️ Sheet {sheet_name} not found.")
-        return []
-
 def safe_parse_llm_output(raw_text):
     """Clean LLM output and return as dict."""
     cleaned = raw_text.strip()
@@ -65,34 +52,40 @@ def safe_parse_llm_output(raw_text):
 
 def write_insights(sheet_name, llm_json):
     """Write LLM output safely to Google Sheet as JSON string."""
-    try:
-        sheet = client.open(sheet_name).sheet1
-    except gspread.SpreadsheetNotFound:
-        sheet = client.create(sheet_name).sheet1
-
-    sheet.clear()
-    sheet.append_row(["insights_raw"])
+    if not llm_json:
+        raise ValueError("Refusing to replace insights with an empty result.")
+    sheet = open_ws(sheet_name, create=True)
     safe_text = json.dumps(llm_json)
-    sheet.append_row([safe_text])
+    replace_rows(sheet, [["insights_raw"], [safe_text]])
+    version = record_insights(llm_json, source="llm_generate_insights")
+    print(f"🗂️ Insights recorded as history version {version}.")
+    notify_insights_updated()
 
 # -----------------------------
 # Main logic
 # -----------------------------
 if __name__ == "__main__":
-    enriched_reviews = fetch_enriched(REVIEWS_ENRICHED)
-    enriched_reddit = fetch_enriched(REDDIT_ENRICHED)
-    enriched_summaries = fetch_enriched(SUMMARIES_ENRICHED)
-
-    all_texts = []
-    for dataset in [enriched_reviews, enriched_reddit, enriched_summaries]:
-        for row in dataset:
-            if "enriched_analysis" in row and row["enriched_analysis"]:
-                all_texts.append(row["enriched_analysis"])
-
-    combined_text = "\n".join(all_texts)
-    print(f"✅ Combined enriched rows: {len(all_texts)}")
-
-    if combined_text.strip():
+    # One concurrent read of all three enriched sheets
+    enriched_sheets = [REVIEWS_ENRICHED, REDDIT_ENRICHED, SUMMARIES_ENRICHED]
+    columns = ["enriched_analysis", FINGERPRINT_COLUMN, *DATE_FIELDS]
+    snapshot = load_sheets(enriched_sheets, columns={name: columns for name in enriched_sheets})
+
+    row_count = sum(1 for rows in snapshot.values() for row in rows if row.get("enriched_analysis"))
+    print(f"✅ Combined enriched rows: {row_count}")
+    retrieval = INSIGHTS_BUILDER == "retrieval" and row_count > 0
+    # Verbatim while it fits the prompt budget, otherwise map-reduced shard summaries
+    combined_text = "" if retrieval else build_evidence(snapshot, namespace="enriched_corpus")
+
+    if retrieval:
+        from insight_retrieval import build_insights
+
+        parsed_insights = build_insights(snapshot)
+        if not parsed_insights:
+            raise SystemExit(f"❌ Insights not generated; {INSIGHTS_SHEET} and its history left unchanged.")
+        write_insights(INSIGHTS_SHEET, parsed_insights)
+        print(f"✅ LLM Insights written to {INSIGHTS_SHEET} (retrieval, {row_count} rows indexed).")
+        print(f"📊 LLM cache: {get_cache().summary()}")
+    elif combined_text.strip():
         insight_prompt = f"""
 You are an AI analyst helping a product team with competitive analysis to make them understand competitor's performance and overall in general user and market insights 
 for B2B and B2C audience segment. Remember competitor product is Philips OptiChamber Diamond valved holding chamber, please do not look into any other Philips product and get yourself confused.
@@ -123,16 +116,16 @@ Based on the input data (reviews, Reddit posts, summaries), produce structured a
 Combined enriched data:
 {combined_text}
 """
-        insight_resp = openai_client.chat.completions.create(
+        llm_output = cached_completion(
+            openai_client,
             model="gpt-4o-mini",
             messages=[{"role": "user", "content": insight_prompt}],
             temperature=0.0,
             max_tokens=1200
         )
-
-        llm_output = insight_resp.choices[0].message.content
         parsed_insights = safe_parse_llm_output(llm_output)
         write_insights(INSIGHTS_SHEET, parsed_insights)
         print(f"✅ LLM Insights written to {INSIGHTS_SHEET}.")
+        print(f"📊 LLM cache: {get_cache().summary()}")
     else:
         print("⚠️ No enriched data found to generate insights.")
@@ -0,0 +1,91 @@
+# llm_packing.py
+
+import json
+
+# -----------------------------
+# Multi-record packing
+# -----------------------------
+# Several short records share one request (and one copy of the instructions); the model
+# answers {"results": [{"id": ..., ...}, ...]}. Packs whose answer is missing ids or does
+# not parse are split in half and retried until single records remain, which fall back
+# to the regular one-record prompt.
+
+def pack_by_budget(indices, cost, budget, max_records):
+    """Greedily group `indices` so each pack's summed cost stays within `budget`."""
+    packs, current, used = [], [], 0
+    for i in indices:
+        c = cost(i)
+        if current and (used + c > budget or len(current) >= max_records):
+            packs.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += c
+    if current:
+        packs.append(current)
+    return packs
+
+def record_id(index):
+    return f"r{index}"
+
+def parse_packed_response(content, ids):
+    """Map each expected id to its JSON analysis text; ids that did not come back are left out."""
+    if isinstance(content, Exception) or not content:
+        return {}
+    cleaned = content.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.replace("```json", "").replace("```", "").strip()
+    try:
+        parsed = json.loads(cleaned)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(parsed, dict) and isinstance(parsed.get("results"), list):
+        items = parsed["results"]
+    elif isinstance(parsed, list):
+        items = parsed
+    elif isinstance(parsed, dict):  # {"r3": {...}, ...}
+        items = [{"id": k, **v} for k, v in parsed.items() if isinstance(v, dict)]
+    else:
+        return {}
+    wanted, found = set(ids), {}
+    for item in items:
+        if isinstance(item, dict) and str(item.get("id")) in wanted:
+            analysis = {k: v for k, v in item.items() if k != "id"}
+            found[str(item["id"])] = json.dumps(analysis, ensure_ascii=False)
+    return found
+
+def run_packed(records, engine, build_pack_request, build_single_request, cost, budget, max_records):
+    """Enrich `records` in packs through an EnrichmentEngine.
+
+    build_pack_request([(id, record), ...]) and build_single_request(record) return
+    create() kwargs; cost(record) is the record's prompt-token estimate.
+    Returns a list aligned with `records`: the analysis text, or the final exception.
+    """
+    results = [None] * len(records)
+    packs = pack_by_budget(range(len(records)), lambda i: cost(records[i]), budget, max_records)
+    rounds = 0
+    while packs:
+        rounds += 1
+        requests = [
+            build_single_request(records[p[0]]) if len(p) == 1
+            else build_pack_request([(record_id(i), records[i]) for i in p])
+            for p in packs
+        ]
+        answers = engine.run_sync(requests)
+        retry = []
+        for pack, answer in zip(packs, answers):
+            if len(pack) == 1:
+                results[pack[0]] = answer
+                continue
+            found = parse_packed_response(answer, [record_id(i) for i in pack])
+            missing = []
+            for i in pack:
+                if record_id(i) in found:
+                    results[i] = found[record_id(i)]
+                else:
+                    missing.append(i)
+            if missing:
+                half = (len(missing) + 1) // 2
+                retry.extend(p for p in (missing[:half], missing[half:]) if p)
+        packs = retry
+    engine.stats["pack_rounds"] = rounds
+    return results
@@ -0,0 +1,148 @@
+# llm_stub_server.py
+#
+# Local stand-in for the OpenAI chat completions endpoint, for measuring the
+# enrichment engine's throughput offline:
+#
+#   python llm_stub_server.py --port 8099 --latency 0.8 --rpm 300
+#   python llm_stub_server.py --bench 500 --concurrency 32 --latency 0.8 --rpm 300
+
+import argparse
+import collections
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# -----------------------------
+# Stub server
+# -----------------------------
+class StubState:
+    """Simulated latency plus a sliding one-minute request window (429 when exceeded)."""
+
+    def __init__(self, latency=0.5, jitter=0.5, rpm=0, error_rate=0.0):
+        self.latency, self.jitter, self.rpm, self.error_rate = latency, jitter, rpm, error_rate
+        self.window = collections.deque()
+        self.lock = threading.Lock()
+        self.counts = collections.Counter()
+
+    def admit(self):
+        """Return None to serve the request, or the seconds to put in Retry-After."""
+        now = time.monotonic()
+        with self.lock:
+            while self.window and now - self.window[0] >= 60:
+                self.window.popleft()
+            if self.rpm and len(self.window) >= self.rpm:
+                self.counts["429"] += 1
+                return max(0.1, 60 - (now - self.window[0]))
+            self.window.append(now)
+            self.counts["200"] += 1
+            return None
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, body, headers=None):
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.endswith("/chat/completions"):
+                return self._send(404, {"error": {"message": "not found"}})
+            retry_after = state.admit()
+            if retry_after is not None:
+                return self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                  {"retry-after-ms": str(int(retry_after * 1000))})
+            if random.random() < state.error_rate:
+                state.counts["500"] += 1
+                return self._send(500, {"error": {"message": "simulated server error"}})
+            time.sleep(max(0.0, random.uniform(state.latency - state.jitter / 2, state.latency + state.jitter / 2)))
+            prompt = "".join(m.get("content") or "" for m in payload.get("messages", []))
+            ids = re.findall(r'"id": "(r\d+)"', prompt)
+            if ids:  # packed request: one result per record id
+                content = json.dumps({"results": [{"id": i, "sentiment": "neutral"} for i in ids]})
+            else:
+                content = json.dumps({"sentiment": "neutral", "echo_chars": len(prompt)})
+            self._send(200, {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": payload.get("model", "stub"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 10,
+                          "total_tokens": len(prompt) // 4 + 10},
+            })
+
+    return Handler
+
+
+def serve(port=8099, state=None):
+    """Start the stub in a background thread; returns the server (call .shutdown())."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state or StubState()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="llm-stub", daemon=True).start()
+    return server
+
+
+# -----------------------------
+# Throughput benchmark
+# -----------------------------
+def bench(n, port, state, concurrency, rpm, tpm):
+    from openai import AsyncOpenAI
+    from llm_engine import EnrichmentEngine
+
+    server = serve(port, state)
+    try:
+        client = AsyncOpenAI(api_key="stub", base_url=f"http://127.0.0.1:{port}/v1", max_retries=0)
+        engine = EnrichmentEngine(client=client, concurrency=concurrency, rpm=rpm, tpm=tpm)
+        requests = [dict(model="gpt-4o-mini", temperature=0.0, max_tokens=500,
+                         messages=[{"role": "user", "content": f"row {i}: " + "lorem ipsum " * 50}])
+                    for i in range(n)]
+        started = time.perf_counter()
+        results = engine.run_sync(requests)
+        elapsed = time.perf_counter() - started
+    finally:
+        server.shutdown()
+    ok = sum(1 for r in results if not isinstance(r, Exception))
+    print(f"✅ {ok}/{n} completions in {elapsed:.1f}s → {ok / elapsed:.1f} req/s ({ok / elapsed * 60:.0f} RPM)")
+    print(f"📊 engine: {engine.stats} | server: {dict(state.counts)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI chat completions server")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="mean seconds per completion")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency spread in seconds")
+    parser.add_argument("--rpm", type=int, default=0, help="server-side limit (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 500 responses")
+    parser.add_argument("--bench", type=int, default=0, help="run N requests through the engine and exit")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--client-rpm", type=float, default=500)
+    parser.add_argument("--client-tpm", type=float, default=200000)
+    args = parser.parse_args()
+
+    state = StubState(args.latency, args.jitter, args.rpm, args.error_rate)
+    if args.bench:
+        bench(args.bench, args.port, state, args.concurrency, args.client_rpm, args.client_tpm)
+    else:
+        server = serve(args.port, state)
+        print(f"🚀 Stub LLM server on http://127.0.0.1:{args.port}/v1 (OPENAI_BASE_URL)")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
@@ -2,7 +2,8 @@
 import os
 from datetime import datetime
 from dotenv import load_dotenv
-import gspread
+from sheets_helper import open_ws
+from sheets_writer import write_rows
 from langchain_google_community import GoogleSearchAPIWrapper
 
 # 1️⃣ Load environment variables
@@ -10,15 +11,12 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
 GOOGLE_SHEET_NAME = "webdata_summaries"
-GOOGLE_APPLICATION_CREDENTIALS = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
 
 if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
     raise ValueError("❌ GOOGLE_API_KEY or GOOGLE_CSE_ID missing in .env")
 
 # 2️⃣ Authenticate Google Sheets
-gc = gspread.service_account(filename=GOOGLE_APPLICATION_CREDENTIALS)
-sh = gc.open(GOOGLE_SHEET_NAME)
-worksheet = sh.sheet1  # first sheet
+worksheet = open_ws(GOOGLE_SHEET_NAME)  # first sheet
 
 # 3️⃣ Setup Google Search via LangChain
 search = GoogleSearchAPIWrapper()
@@ -48,7 +46,7 @@ for q in queries:
 
 # 6️⃣ Append rows to Google Sheet
 if all_rows:
-    worksheet.append_rows(all_rows)
+    write_rows(worksheet, all_rows)
     print(f"✅ Added {len(all_rows)} rows to {GOOGLE_SHEET_NAME}")
 else:
     print("⚠️ No results fetched")
\ No newline at end of file
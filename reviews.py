@@ -1,32 +1,25 @@
 # reviews.py
-import os
 import hashlib
 import time
 import requests
 from bs4 import BeautifulSoup
-import gspread
 from dotenv import load_dotenv
-from google.oauth2.service_account import Credentials
+from sheets_helper import open_ws
+from sheets_writer import append_rows_once, write_rows
 
 # ----------------------
 # Setup Google Sheets
 # ----------------------
 load_dotenv()
-google_credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-
-scope = ["https://spreadsheets.google.com/feeds",
-         "https://www.googleapis.com/auth/drive"]
-creds = Credentials.from_service_account_file(google_credentials_path, scopes=scope)
-client = gspread.authorize(creds)
 
 SHEET_NAME = "online_reviews_rating"
-sheet = client.open(SHEET_NAME).sheet1
+sheet = open_ws(SHEET_NAME)
 
 # Add header if first time
-if sheet.row_count == 1:
+if not sheet.row_values(1):
     header = ["review_id", "product_name", "review_title", "review_text", "rating",
               "reviewer_name", "review_date", "retailer", "verified_purchase", "url"]
-    sheet.append_row(header)
+    append_rows_once(sheet, [header])
 
 # ----------------------
 # Helper to generate ID
@@ -199,8 +192,7 @@ for scraper in [scrape_ebay, scrape_amazon_uk, scrape_directhome, scrape_respsho
     except Exception as e:
         print(f"⚠️ Error in {scraper.__name__}: {e}")
 
-# Push to Google Sheet
-for row in all_reviews:
-    sheet.append_row(row)
+# Push to Google Sheet (one rate-limited append)
+write_rows(sheet, all_reviews)
 
 print(f"🎉 Done! Inserted {len(all_reviews)} reviews into {SHEET_NAME}")
\ No newline at end of file
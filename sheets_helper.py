@@ -1,6 +1,15 @@
 import gspread
 from google.oauth2.service_account import Credentials
+import json
 import os
+import threading
+
+from sheets_writer import call_with_backoff, replace_rows, write_rows
+
+# Storage backend for every worksheet opened through this module:
+#   "sheets" (default) - Google Sheets via gspread
+#   "sqlite"           - local SQLite file (see sqlite_store.py); Sheets becomes an export sink
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "sheets").lower()
 
 def _get_creds():
     cred_path = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS")
@@ -14,23 +23,128 @@ def _get_creds():
     ]
     return Credentials.from_service_account_file(cred_path, scopes=scopes)
 
-# Global gspread client
-_gc = gspread.authorize(_get_creds())
+# Global gspread client (created on first use so the SQLite backend never needs Google credentials).
+# Every module shares this one authorized session.
+_gc = None
+_lock = threading.RLock()
+
+def get_client():
+    global _gc
+    with _lock:
+        if _gc is None:
+            _gc = gspread.authorize(_get_creds())
+        return _gc
+
+# -----------------------------
+# Title -> spreadsheet key resolver (persisted across runs)
+# -----------------------------
+# client.open(title) is a Drive files.list search; open_by_key skips it.
+SHEET_KEYS_PATH = os.environ.get(
+    "SHEET_KEYS_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sheet_keys.json"),
+)
+_keys = None
+_handles = {}  # (title, worksheet_index) -> worksheet
+
+def _load_keys():
+    global _keys
+    if _keys is None:
+        try:
+            with open(SHEET_KEYS_PATH, encoding="utf-8") as f:
+                _keys = json.load(f)
+        except (OSError, ValueError):
+            _keys = {}
+    return _keys
+
+def _save_keys():
+    os.makedirs(os.path.dirname(SHEET_KEYS_PATH) or ".", exist_ok=True)
+    tmp = SHEET_KEYS_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(_keys, f, indent=2, sort_keys=True)
+    os.replace(tmp, SHEET_KEYS_PATH)
+
+def _remember_key(title, key):
+    with _lock:
+        keys = _load_keys()
+        if keys.get(title) != key:
+            keys[title] = key
+            _save_keys()
+
+def invalidate(spreadsheet_title):
+    """Forget the cached key and worksheet handles for a spreadsheet."""
+    with _lock:
+        for handle in [h for h in _handles if h[0] == spreadsheet_title]:
+            del _handles[handle]
+        if _load_keys().pop(spreadsheet_title, None) is not None:
+            _save_keys()
+
+def is_not_found(exc):
+    """True when an error means the spreadsheet (or a cached handle to it) no longer exists."""
+    if isinstance(exc, gspread.SpreadsheetNotFound):
+        return True
+    return isinstance(exc, gspread.exceptions.APIError) and getattr(exc, "code", None) == 404
 
-def open_ws(spreadsheet_title, worksheet_index=0):
-    """Open a Google Spreadsheet by its title and return the first worksheet by default."""
-    sh = _gc.open(spreadsheet_title)
-    return sh.get_worksheet(worksheet_index)
+def open_spreadsheet(spreadsheet_title):
+    """Open a spreadsheet by its cached key, falling back to a title search."""
+    client = get_client()
+    key = _load_keys().get(spreadsheet_title)
+    if key:
+        try:
+            return client.open_by_key(key)
+        except (gspread.SpreadsheetNotFound, gspread.exceptions.APIError) as e:
+            if not is_not_found(e):
+                raise
+            invalidate(spreadsheet_title)
+    sh = client.open(spreadsheet_title)
+    _remember_key(spreadsheet_title, sh.id)
+    return sh
+
+def create_spreadsheet(spreadsheet_title):
+    sh = get_client().create(spreadsheet_title)
+    _remember_key(spreadsheet_title, sh.id)
+    return sh
+
+def open_ws(spreadsheet_title, worksheet_index=0, create=False):
+    """Open a Google Spreadsheet by its title and return the first worksheet by default.
+
+    Handles are cached per process; with create=True a missing spreadsheet is created.
+    """
+    if STORAGE_BACKEND == "sqlite":
+        from sqlite_store import SqliteWorksheet
+        return SqliteWorksheet(spreadsheet_title)
+    handle = (spreadsheet_title, worksheet_index)
+    with _lock:
+        ws = _handles.get(handle)
+    if ws is not None:
+        return ws
+    try:
+        sh = open_spreadsheet(spreadsheet_title)
+    except gspread.SpreadsheetNotFound:
+        if not create:
+            raise
+        sh = create_spreadsheet(spreadsheet_title)
+    ws = sh.get_worksheet(worksheet_index)
+    with _lock:
+        _handles[handle] = ws
+    return ws
 
 def ensure_header(ws, header):
     """Make sure the worksheet has the right header row."""
     existing = ws.row_values(1)
-    if existing != header:
+    if existing == header:
+        return
+    if hasattr(ws, "spreadsheet"):
+        # Overwrite row 1 in place (blanking any extra old cells): unlike delete+insert it is safe to retry
+        padded = list(header) + [""] * (len(existing) - len(header))
+        call_with_backoff(ws.update, [padded], "A1", value_input_option="RAW")
+    else:
         ws.delete_rows(1)
         ws.insert_row(header, 1)
 
 def get_existing_values_in_column(ws, col_name):
     """Return all values in a given column by column name."""
+    if hasattr(ws, "distinct_values"):
+        return ws.distinct_values(col_name)
     header = ws.row_values(1)
     if col_name not in header:
         return set()
@@ -40,5 +154,245 @@ def get_existing_values_in_column(ws, col_name):
 def append_dicts(ws, rows, columns):
     """Append list of dicts to sheet following given column order."""
     values = [[r.get(c, "") for c in columns] for r in rows]
-    ws.append_rows(values, value_input_option="RAW")
-    return len(values)
\ No newline at end of file
+    return write_rows(ws, values, value_input_option="RAW")
+
+# -----------------------------
+# Paged, streaming reader
+# -----------------------------
+PAGE_SIZE = int(os.environ.get("SHEETS_PAGE_SIZE", "1000"))
+
+def iter_records(ws, columns=None, page_size=PAGE_SIZE, start_row=2, with_row=False):
+    """Yield records lazily, one A1-range page at a time, instead of get_all_records().
+
+    `columns` projects the read down to those columns (one batch_get per page).
+    `start_row` is a 1-based sheet row (2 = first record) for resuming a scan.
+    With with_row=True yields (sheet_row_number, record) pairs.
+    """
+    if hasattr(ws, "iter_records"):
+        yield from ws.iter_records(columns=columns, page_size=page_size, start_row=start_row, with_row=with_row)
+        return
+
+    header = call_with_backoff(ws.row_values, 1, rate_limited=False)
+    if not header:
+        return
+    if columns is None:
+        positions = list(range(1, len(header) + 1))
+    else:
+        positions = [header.index(c) + 1 for c in columns if c in header]
+        if not positions:
+            return
+    names = [header[i - 1] for i in positions]
+    a1 = gspread.utils.rowcol_to_a1
+
+    # The API trims trailing blank rows/cells from every range, so a short page does not
+    # mean the data ended: pages are padded to their requested height and the scan runs to
+    # row_count. Blank records are held back and only yielded once a later row has data,
+    # so the empty grid below the last row is never returned; in projected mode one
+    # full-width read of that blank tail decides which of its rows are real records.
+    row, held = max(start_row, 2), []
+    while row <= ws.row_count:
+        end = min(row + page_size - 1, ws.row_count)
+        if columns is None:
+            page = call_with_backoff(ws.get, f"{a1(row, 1)}:{a1(end, len(header))}", rate_limited=False)
+        else:
+            # Column-major ranges -> row-major page
+            ranges = [f"{a1(row, i)}:{a1(end, i)}" for i in positions]
+            cols = call_with_backoff(ws.batch_get, ranges, rate_limited=False)
+            height = max((len(c) for c in cols), default=0)
+            page = [[(c[r][0] if r < len(c) and c[r] else "") for c in cols] for r in range(height)]
+        page = list(page) + [[]] * (end - row + 1 - len(page))
+        for offset, values in enumerate(page):
+            values = list(values) + [""] * (len(names) - len(values))
+            record = dict(zip(names, gspread.utils.numericise_all(values[:len(names)])))
+            item = (row + offset, record) if with_row else record
+            if not any(str(v).strip() for v in values[:len(names)]):
+                held.append(item)
+                continue
+            yield from held
+            held = []
+            yield item
+        row = end + 1
+    if held and columns is not None:
+        first = ws.row_count - len(held) + 1  # held rows always run to the end of the grid
+        tail = call_with_backoff(ws.get, f"{a1(first, 1)}:{a1(ws.row_count, len(header))}", rate_limited=False)
+        used = max((i + 1 for i, r in enumerate(tail) if any(str(v).strip() for v in r)), default=0)
+        yield from held[:used]
+
+# -----------------------------
+# Parallel multi-sheet loader
+# -----------------------------
+LOAD_WORKERS = int(os.environ.get("SHEETS_LOAD_WORKERS", "8"))
+
+def _values_to_records(values, columns=None):
+    if not values:
+        return []
+    header = values[0]
+    keep = [i for i, h in enumerate(header) if columns is None or h in columns]
+    records = []
+    for row in values[1:]:
+        row = list(row) + [""] * (len(header) - len(row))
+        row = gspread.utils.numericise_all(row[:len(header)])
+        records.append({header[i]: row[i] for i in keep})
+    return records
+
+def _load_spreadsheet(title, worksheet_titles):
+    """Fetch several worksheets of one spreadsheet with a single values.batchGet."""
+    # A range without a sheet name addresses the first sheet, so a known key needs no metadata call
+    ranges = [f"'{w}'" if w else "A:ZZZ" for w in worksheet_titles]
+    params = {"valueRenderOption": "FORMATTED_VALUE", "majorDimension": "ROWS"}
+    key = _load_keys().get(title)
+    if key:
+        try:
+            resp = call_with_backoff(get_client().http_client.values_batch_get, key, ranges,
+                                     params=params, rate_limited=False)
+            return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+        except (gspread.SpreadsheetNotFound, gspread.exceptions.APIError) as e:
+            if not is_not_found(e):
+                raise
+            invalidate(title)
+    sh = open_spreadsheet(title)
+    resp = call_with_backoff(sh.values_batch_get, ranges, params=params, rate_limited=False)
+    return [vr.get("values", []) for vr in resp.get("valueRanges", [])]
+
+def load_sheets(names, columns=None, max_workers=LOAD_WORKERS):
+    """Load many sheets concurrently and return one snapshot: {name: [records]}.
+
+    `names` are spreadsheet titles (first worksheet) or (spreadsheet_title, worksheet_title)
+    pairs; worksheets of the same spreadsheet share one values.batchGet call, and separate
+    spreadsheets are fetched on a bounded thread pool. `columns` optionally maps a name to
+    the columns to keep. Missing spreadsheets load as [].
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    columns = columns or {}
+    specs = [(n, None) if isinstance(n, str) else tuple(n) for n in names]
+    keyed = {spec: spec[0] if spec[1] is None else spec for spec in specs}
+    if STORAGE_BACKEND == "sqlite":
+        return {keyed[spec]: list(iter_records(open_ws(spec[0]), columns=columns.get(keyed[spec])))
+                for spec in specs}
+
+    groups = {}
+    for spec in specs:
+        groups.setdefault(spec[0], []).append(spec)
+
+    def load_group(title):
+        group = groups[title]
+        try:
+            results = _load_spreadsheet(title, [w for _, w in group])
+        except gspread.SpreadsheetNotFound:
+            print(f"⚠️ Sheet {title} not found.")
+            results = [[] for _ in group]
+        return {keyed[spec]: _values_to_records(values, columns.get(keyed[spec]))
+                for spec, values in zip(group, results)}
+
+    snapshot = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as pool:
+        for part in pool.map(load_group, groups):
+            snapshot.update(part)
+    return snapshot
+
+# -----------------------------
+# Retention / compaction
+# -----------------------------
+def _contiguous_ranges(row_numbers):
+    """[2, 3, 4, 9, 10] -> [(2, 4), (9, 10)]"""
+    ranges = []
+    for n in sorted(row_numbers):
+        if ranges and n == ranges[-1][1] + 1:
+            ranges[-1][1] = n
+        else:
+            ranges.append([n, n])
+    return [tuple(r) for r in ranges]
+
+def apply_retention(ws, date_col, ttl_days, date_format=None, mode="rewrite", drop_empty=False):
+    """Drop rows whose `date_col` is older than `ttl_days`, in a constant number of API calls.
+
+    Dates are parsed in one vectorized pass; rows with unparseable dates are kept, rows with
+    an empty date are kept unless drop_empty=True. Two ways to apply the result:
+      - "rewrite": one range update with the survivors plus one batch_clear of the leftover tail
+      - "delete":  expired rows merged into contiguous ranges, removed in a single batch_update
+    Returns (kept, removed).
+    """
+    import pandas as pd
+    from datetime import datetime, timedelta, timezone
+
+    if mode == "delete":
+        # Only the date column is needed to decide which rows go
+        if date_col not in ws.row_values(1):
+            raise ValueError(f"Column '{date_col}' not found in {ws.title}")
+        numbered = list(iter_records(ws, columns=[date_col], with_row=True))
+        row_numbers = [n for n, _ in numbered]
+        dates = [str(r.get(date_col, "")).strip() for _, r in numbered]
+    else:
+        values = ws.get_all_values()
+        if len(values) <= 1:
+            return max(len(values) - 1, 0), 0
+        header, rows = values[0], values[1:]
+        if date_col not in header:
+            raise ValueError(f"Column '{date_col}' not found in {ws.title}")
+        col = header.index(date_col)
+        dates = [str(r[col]).strip() if col < len(r) else "" for r in rows]
+    if not dates:
+        return 0, 0
+
+    raw = pd.Series(dates, dtype=object)
+    parsed = pd.to_datetime(raw, format=date_format, errors="coerce", utc=True)
+    cutoff = pd.Timestamp(datetime.now(timezone.utc) - timedelta(days=ttl_days))
+    expired = (parsed < cutoff).to_numpy()  # NaT compares False, so unparseable rows survive
+    if drop_empty:
+        expired = expired | (raw == "").to_numpy()
+
+    removed = int(expired.sum())
+    if removed == 0:
+        return len(dates), 0
+
+    if mode == "delete":
+        ranges = _contiguous_ranges(n for n, gone in zip(row_numbers, expired) if gone)
+        if hasattr(ws, "spreadsheet"):
+            # Bottom-up so earlier deletions don't shift later ranges; one round trip in total
+            requests = [{
+                "deleteDimension": {
+                    "range": {"sheetId": ws.id, "dimension": "ROWS", "startIndex": start - 1, "endIndex": end}
+                }
+            } for start, end in reversed(ranges)]
+            call_with_backoff(ws.spreadsheet.batch_update, {"requests": requests})
+        else:
+            for start, end in reversed(ranges):
+                ws.delete_rows(start, end)
+    elif mode == "rewrite":
+        survivors = [r for r, gone in zip(rows, expired) if not gone]
+        if hasattr(ws, "batch_clear"):
+            width = max(len(r) for r in values)
+            call_with_backoff(ws.update, [header] + survivors, "A1", value_input_option="RAW")
+            first_stale = len(survivors) + 2
+            last_row = len(values)
+            call_with_backoff(ws.batch_clear, [
+                f"{gspread.utils.rowcol_to_a1(first_stale, 1)}:{gspread.utils.rowcol_to_a1(last_row, width)}"
+            ])
+        else:
+            ws.clear()
+            ws.append_rows([header] + survivors)
+    else:
+        raise ValueError(f"Unknown retention mode '{mode}'")
+    return len(dates) - removed, removed
+
+def export_to_sheets(spreadsheet_title, worksheet_index=0):
+    """Copy a locally stored sheet to Google Sheets in one write (SQLite backend's export sink)."""
+    from sqlite_store import SqliteWorksheet
+    values = SqliteWorksheet(spreadsheet_title).get_all_values()
+    try:
+        sh = open_spreadsheet(spreadsheet_title)
+    except gspread.SpreadsheetNotFound:
+        sh = create_spreadsheet(spreadsheet_title)
+    replace_rows(sh.get_worksheet(worksheet_index), values)
+    return max(len(values) - 1, 0)
+
+if __name__ == "__main__":
+    import sys
+
+    # python sheets_helper.py export <title> [<title> ...]
+    if len(sys.argv) >= 3 and sys.argv[1] == "export":
+        for title in sys.argv[2:]:
+            print(f"📤 Exported {export_to_sheets(title)} rows of {title} to Google Sheets.")
+    else:
+        print("Usage: python sheets_helper.py export <spreadsheet title> [...]")
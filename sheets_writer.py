@@ -0,0 +1,160 @@
+# sheets_writer.py
+
+import os
+import random
+import threading
+import time
+
+import requests
+from gspread.exceptions import APIError
+from gspread.utils import ValueRenderOption
+
+# -----------------------------
+# Quota settings
+# -----------------------------
+# Google Sheets allows 60 write requests per minute per user; stay just under it.
+WRITES_PER_MINUTE = float(os.getenv("SHEETS_WRITES_PER_MINUTE", "55"))
+MAX_ROWS_PER_CALL = int(os.getenv("SHEETS_MAX_ROWS_PER_CALL", "5000"))
+MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES", "6"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+# -----------------------------
+# Token bucket
+# -----------------------------
+class TokenBucket:
+    """Blocking token bucket: `rate` tokens per minute, bursts up to `capacity`."""
+
+    def __init__(self, rate_per_minute=WRITES_PER_MINUTE, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or max(1.0, rate_per_minute / 6)  # ~10s of burst
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                wait = (n - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_bucket = TokenBucket()
+
+
+# -----------------------------
+# Retry with jittered exponential backoff
+# -----------------------------
+def _status(exc):
+    if isinstance(exc, APIError):
+        return getattr(exc, "code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    return None
+
+def _retry_after(exc):
+    response = getattr(exc, "response", None)
+    value = getattr(response, "headers", {}).get("Retry-After") if response is not None else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+class AmbiguousWriteError(Exception):
+    """A non-idempotent call failed in a way that does not tell whether it was applied."""
+
+
+def _surely_not_applied(exc):
+    # 429 is rejected before the request runs; a connect timeout never reached the server
+    return _status(exc) == 429 or isinstance(exc, requests.exceptions.ConnectTimeout)
+
+def call_with_backoff(fn, *args, rate_limited=True, idempotent=True, **kwargs):
+    """Run one Sheets API call under the shared token bucket, retrying 429/5xx and dropped connections.
+
+    With idempotent=False (appends) only failures that were certainly not applied are
+    retried; a timeout, dropped connection or 5xx raises AmbiguousWriteError instead.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        if rate_limited:
+            _bucket.acquire()
+        try:
+            return fn(*args, **kwargs)
+        except (APIError, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            status = _status(e)
+            if isinstance(e, APIError) and status not in RETRYABLE_STATUS:
+                raise
+            if not idempotent and not _surely_not_applied(e):
+                raise AmbiguousWriteError(f"{getattr(fn, '__name__', 'call')} may or may not have been applied") from e
+            if attempt == MAX_RETRIES:
+                raise
+            # Full jitter: sleep uniformly in [0, min(cap, base * 2^attempt)], but honour Retry-After
+            delay = _retry_after(e) or random.uniform(0, min(64.0, 1.0 * 2 ** attempt))
+            print(f"⏳ Sheets call failed ({status or type(e).__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def _is_remote(ws):
+    """Local (SQLite) worksheets need no rate limiting."""
+    return hasattr(ws, "spreadsheet")
+
+def _cell(value):
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def _rows_landed(ws, rows):
+    """True if the sheet already ends with `rows` (an earlier, failed-looking append went through)."""
+    values = call_with_backoff(ws.get_all_values, value_render_option=ValueRenderOption.unformatted,
+                               rate_limited=False)
+    if len(values) < len(rows):
+        return False
+    norm = lambda row: [_cell(v) for v in row] + [""] * (len(values[0]) - len(row))
+    return all(norm(a)[:len(values[0])] == norm(b)[:len(values[0])] for a, b in zip(values[-len(rows):], rows))
+
+def append_rows_once(ws, rows, value_input_option="RAW"):
+    """append_rows that does not write the same rows twice.
+
+    After an ambiguous failure the sheet tail is read back: if the rows are there the
+    append counts as done, otherwise it is safe to send again.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            return call_with_backoff(ws.append_rows, rows, value_input_option=value_input_option,
+                                     rate_limited=_is_remote(ws), idempotent=False)
+        except AmbiguousWriteError as e:
+            if _rows_landed(ws, rows):
+                print(f"✅ Append of {len(rows)} rows had gone through despite {e.__cause__!r}; not resending.")
+                return None
+            if attempt == MAX_RETRIES:
+                raise
+            delay = random.uniform(0, min(64.0, 1.0 * 2 ** attempt))
+            print(f"⏳ Append of {len(rows)} rows was not applied ({e.__cause__!r}), resending in {delay:.1f}s")
+            time.sleep(delay)
+
+def write_rows(ws, rows, value_input_option="RAW"):
+    """Append `rows` in as few calls as possible (up to MAX_ROWS_PER_CALL rows each).
+
+    Returns the number of rows written; a failing chunk raises, leaving earlier chunks written.
+    """
+    rows = [list(r) for r in rows]
+    for i in range(0, len(rows), MAX_ROWS_PER_CALL):
+        append_rows_once(ws, rows[i:i + MAX_ROWS_PER_CALL], value_input_option=value_input_option)
+    return len(rows)
+
+def replace_rows(ws, rows, value_input_option="RAW"):
+    """Overwrite the whole worksheet with `rows`: one clear and one update from A1.
+
+    Both calls are idempotent, so they are retried like any read.
+    """
+    rows = [list(r) for r in rows]
+    call_with_backoff(ws.clear, rate_limited=_is_remote(ws))
+    if rows:
+        call_with_backoff(ws.update, rows, "A1", value_input_option=value_input_option, rate_limited=_is_remote(ws))
+    return len(rows)
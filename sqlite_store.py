@@ -0,0 +1,286 @@
+# sqlite_store.py
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# -----------------------------
+# Local SQLite storage (drop-in for the gspread worksheets we use)
+# -----------------------------
+# Each spreadsheet title maps to one table. Row 1 (the header) lives in the `_sheets`
+# table; data rows are ordered by an autoincrement `_row` id, so the usual 1-based
+# sheet row numbers (header = 1, first record = 2) still work.
+SQLITE_PATH = os.getenv(
+    "SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "pipeline.db"),
+)
+
+# Lookup columns that get a real index whenever a sheet has them
+INDEXED_COLUMNS = {"url", "review_id", "date", "Date", "published_at", "retrieved_at", "URL", "Title"}
+
+_conn = None
+_conn_lock = threading.RLock()
+
+
+def get_connection(path=SQLITE_PATH):
+    """Process-wide connection in WAL mode (readers never block the writer)."""
+    global _conn
+    with _conn_lock:
+        if _conn is None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            _conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            _conn.execute("PRAGMA journal_mode=WAL")
+            _conn.execute("PRAGMA synchronous=NORMAL")
+            _conn.execute(
+                "CREATE TABLE IF NOT EXISTS _sheets (title TEXT PRIMARY KEY, header TEXT NOT NULL DEFAULT '[]')"
+            )
+        return _conn
+
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class SqliteWorksheet:
+    """Implements the subset of gspread.Worksheet the pipeline relies on."""
+
+    def __init__(self, title, conn=None):
+        self.title = title
+        self.conn = conn or get_connection()
+        self.table = _q("ws_" + title)
+        with _conn_lock:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (_row INTEGER PRIMARY KEY AUTOINCREMENT)")
+            self.conn.execute("INSERT OR IGNORE INTO _sheets (title) VALUES (?)", (title,))
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction; nested calls join the outer one."""
+        with _conn_lock:
+            if self.conn.in_transaction:
+                yield
+                return
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    # -----------------------------
+    # Header / schema
+    # -----------------------------
+    def _header(self):
+        row = self.conn.execute("SELECT header FROM _sheets WHERE title = ?", (self.title,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def _columns(self):
+        return [r[1] for r in self.conn.execute(f"PRAGMA table_info({self.table})") if r[1] != "_row"]
+
+    def _set_header(self, header):
+        header = [str(h) for h in header]
+        existing = set(self._columns())
+        for col in header:
+            if col and col not in existing:
+                self.conn.execute(f"ALTER TABLE {self.table} ADD COLUMN {_q(col)} DEFAULT ''")
+                existing.add(col)
+                if col in INDEXED_COLUMNS:
+                    index_name = _q(f"ix_{self.title}_{col}")
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {self.table} ({_q(col)})")
+        self.conn.execute("UPDATE _sheets SET header = ? WHERE title = ?", (json.dumps(header), self.title))
+
+    @property
+    def row_count(self):
+        count = self.conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return count + (1 if self._header() else 0)
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def row_values(self, row):
+        if row == 1:
+            return self._header()
+        values = self.get_all_values()
+        return values[row - 1] if 0 < row <= len(values) else []
+
+    def col_values(self, col):
+        header = self._header()
+        if not 0 < col <= len(header):
+            return []
+        name = header[col - 1]
+        values = [r[0] for r in self.conn.execute(f"SELECT {_q(name)} FROM {self.table} ORDER BY _row")]
+        return [name] + values
+
+    def distinct_values(self, col_name):
+        """Indexed fast path for sheets_helper.get_existing_values_in_column."""
+        if col_name not in self._header():
+            return set()
+        return {r[0] for r in self.conn.execute(f"SELECT DISTINCT {_q(col_name)} FROM {self.table}")}
+
+    def get_all_values(self, **kwargs):
+        header = self._header()
+        if not header:
+            return []
+        cols = ", ".join(_q(h) for h in header)
+        rows = self.conn.execute(f"SELECT {cols} FROM {self.table} ORDER BY _row").fetchall()
+        return [header] + [list(r) for r in rows]
+
+    def get_all_records(self):
+        header = self._header()
+        if not header:
+            return []
+        cols = ", ".join(_q(h) for h in header)
+        cursor = self.conn.execute(f"SELECT {cols} FROM {self.table} ORDER BY _row")
+        return [dict(zip(header, r)) for r in cursor]
+
+    def iter_records(self, columns=None, page_size=1000, start_row=2, with_row=False):
+        """Keyset-paginated reader backing sheets_helper.iter_records."""
+        header = self._header()
+        names = [c for c in (columns or header) if c in header]
+        if not names:
+            return
+        cols = ", ".join(_q(c) for c in names)
+        # Translate the sheet row number into the _row id to continue from
+        first = self.conn.execute(
+            f"SELECT _row FROM {self.table} ORDER BY _row LIMIT 1 OFFSET ?", (max(start_row, 2) - 2,)
+        ).fetchone()
+        if first is None:
+            return
+        last_id, row_number = first[0] - 1, max(start_row, 2)
+        while True:
+            page = self.conn.execute(
+                f"SELECT _row, {cols} FROM {self.table} WHERE _row > ? ORDER BY _row LIMIT ?", (last_id, page_size)
+            ).fetchall()
+            if not page:
+                return
+            for r in page:
+                record = dict(zip(names, r[1:]))
+                yield (row_number, record) if with_row else record
+                row_number += 1
+            last_id = page[-1][0]
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def append_rows(self, values, value_input_option="RAW", **kwargs):
+        values = [list(v) for v in values]
+        if not values:
+            return
+        with self._transaction():
+            header = self._header()
+            if not header:
+                # First row written to an empty sheet is its header, like in Google Sheets
+                self._set_header(values[0])
+                header, values = self._header(), values[1:]
+            width = max([len(header)] + [len(v) for v in values])
+            if width > len(header):
+                header = header + [f"col_{i + 1}" for i in range(len(header), width)]
+                self._set_header(header)
+            if values:
+                cols = ", ".join(_q(h) for h in header)
+                marks = ", ".join("?" for _ in header)
+                padded = [[_cell(c) for c in v] + [""] * (len(header) - len(v)) for v in values]
+                self.conn.executemany(f"INSERT INTO {self.table} ({cols}) VALUES ({marks})", padded)
+
+    def append_row(self, values, value_input_option="RAW", **kwargs):
+        self.append_rows([values], value_input_option)
+
+    def insert_row(self, values, index=1, **kwargs):
+        """Insert `values` as sheet row `index`; rows at and below it move down one."""
+        if index == 1:
+            with self._transaction():
+                self._set_header(values)
+            return
+        with self._transaction():
+            ids = self._row_ids(index, index)
+            if not ids:
+                self._pad_rows(index - 1)
+                self.append_rows([values])
+                return
+            # Shift ids >= the target up by one (via negatives, so the primary key never collides)
+            self.conn.execute(f"UPDATE {self.table} SET _row = -(_row + 1) WHERE _row >= ?", (ids[0],))
+            self.conn.execute(f"UPDATE {self.table} SET _row = -_row WHERE _row < 0")
+            self.append_rows([values])
+            last = self.conn.execute(f"SELECT MAX(_row) FROM {self.table}").fetchone()[0]
+            self.conn.execute(f"UPDATE {self.table} SET _row = ? WHERE _row = ?", (ids[0], last))
+
+    def _row_ids(self, start, end):
+        """Map 1-based sheet rows [start, end] (data rows start at 2) to `_row` ids."""
+        offset = max(start - 2, 0)
+        limit = end - max(start, 2) + 1
+        return [r[0] for r in self.conn.execute(
+            f"SELECT _row FROM {self.table} ORDER BY _row LIMIT ? OFFSET ?", (limit, offset)
+        )]
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        with self._transaction():
+            if start_index == 1:
+                self.conn.execute("UPDATE _sheets SET header = '[]' WHERE title = ?", (self.title,))
+            ids = self._row_ids(start_index, end_index)
+            self.conn.executemany(f"DELETE FROM {self.table} WHERE _row = ?", [(i,) for i in ids])
+
+    def clear(self):
+        with self._transaction():
+            self.conn.execute(f"DELETE FROM {self.table}")
+            self.conn.execute("UPDATE _sheets SET header = '[]' WHERE title = ?", (self.title,))
+
+    def _pad_rows(self, last_row):
+        """Append blank data rows until the sheet has `last_row` rows (header included)."""
+        missing = last_row - self.row_count
+        if missing > 0 and self._header():
+            self.conn.executemany(f"INSERT INTO {self.table} DEFAULT VALUES", [()] * missing)
+
+    def update(self, values, range_name=None, **kwargs):
+        """Write a block of cells whose top-left corner is the start of `range_name` (default A1).
+
+        Like gspread, cells outside the block are left alone; the header row renames
+        columns, and rows past the end of the sheet are added.
+        """
+        cell = (range_name or "A1").split("!")[-1].split(":")[0]
+        letters, digits = re.fullmatch(r"\$?([A-Za-z]*)\$?(\d*)", cell).groups()
+        top = int(digits) if digits else 1
+        left = 1
+        if letters:
+            left = 0
+            for ch in letters.upper():
+                left = left * 26 + ord(ch) - 64
+        values = [list(v) for v in values]
+        if not values:
+            return
+        with self._transaction():
+            width = left - 1 + max(len(v) for v in values)
+            header = self._header()
+            if top == 1:
+                new = header + [""] * (max(width, len(header)) - len(header))
+                new[left - 1:left - 1 + len(values[0])] = [str(c) for c in values[0]]
+                columns = set(self._columns())
+                for old, name in zip(header, new):
+                    if old and name and old != name and name not in columns:
+                        self.conn.execute(f"ALTER TABLE {self.table} RENAME COLUMN {_q(old)} TO {_q(name)}")
+                        columns = (columns - {old}) | {name}
+                self._set_header([h or f"col_{i + 1}" for i, h in enumerate(new)])
+                values, top = values[1:], 2
+            elif width > len(header):
+                self._set_header(header + [f"col_{i + 1}" for i in range(len(header), width)])
+            if not values:
+                return
+            header = self._header()
+            self._pad_rows(top + len(values) - 1)
+            ids = self._row_ids(top, top + len(values) - 1)
+            for row_id, row in zip(ids, values):
+                names = header[left - 1:left - 1 + len(row)]
+                sets = ", ".join(f"{_q(n)} = ?" for n in names)
+                self.conn.execute(f"UPDATE {self.table} SET {sets} WHERE _row = ?",
+                                  [_cell(c) for c in row] + [row_id])
@@ -0,0 +1,179 @@
+# vector_store.py
+
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_community.vectorstores import FAISS
+
+from faiss_indexes import (FAISS_NLIST, build_index, default_nlist, index_kind, index_type_for,
+                           min_training_points, stored_vectors, tune)
+
+# -----------------------------
+# Shared FAISS store helpers
+# -----------------------------
+# One folder, several named indexes (<name>.faiss + <name>.pkl). Documents are stored
+# under their content hash as docstore id, so "already indexed?" is a set lookup and
+# re-adding the same text is a no-op. <name>.meta.json records the embedding provider,
+# model and dimension an index was built with, so it is always queried with the same one.
+# Indexes start flat and are converted to the configured type (faiss_indexes.py) on save
+# once they hold enough vectors to train it.
+load_dotenv()
+FAISS_DIR = os.getenv(
+    "FAISS_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "faiss_store"),
+)
+# Disk-backed cache in front of the embedding API (EMBEDDING_CACHE=0 to disable)
+EMBEDDING_CACHE = os.getenv("EMBEDDING_CACHE", "1").lower() not in ("0", "false", "no")
+# Provider for new indexes: openai | local | hashing. Per index: EMBEDDING_PROVIDER_<NAME>
+# (e.g. EMBEDDING_PROVIDER_ENRICHED=local). Existing indexes keep the one in their metadata.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+
+
+def get_embeddings(provider=None):
+    from embedding_providers import make_embeddings
+
+    provider = provider or EMBEDDING_PROVIDER
+    embeddings = make_embeddings(provider)
+    if EMBEDDING_CACHE and provider != "hashing":  # hashing is cheaper than a cache lookup
+        from embedding_cache import CachedEmbeddings
+        embeddings = CachedEmbeddings(embeddings)
+    return embeddings
+
+def _meta_path(index_name):
+    return os.path.join(FAISS_DIR, f"{index_name}.meta.json")
+
+def store_meta(index_name):
+    """Provider/model/dim an index was built with, or None (not built, or built before metadata)."""
+    try:
+        with open(_meta_path(index_name), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def embeddings_for(index_name):
+    """The embeddings an index must be queried and extended with."""
+    meta = store_meta(index_name)
+    if meta:
+        return get_embeddings(meta["provider"])
+    return get_embeddings(os.getenv(f"EMBEDDING_PROVIDER_{index_name.upper()}") or EMBEDDING_PROVIDER)
+
+def _describe(embeddings):
+    from embedding_cache import model_id
+    from embedding_providers import provider_name
+
+    inner = getattr(embeddings, "embeddings", embeddings)  # unwrap CachedEmbeddings
+    return provider_name(embeddings), model_id(inner), getattr(inner, "dim", None)
+
+def check_compatible(index_name, store, embeddings):
+    """Refuse to mix vectors from different embedding models in one index."""
+    provider, model, dim = _describe(embeddings)
+    meta = store_meta(index_name)
+    if meta and meta["model"] != model:
+        raise ValueError(f"❌ Index '{index_name}' was built with {meta['provider']}/{meta['model']}, "
+                         f"not {provider}/{model}.")
+    expected = meta["dim"] if meta else dim
+    if store is not None and expected and store.index.d != expected:
+        raise ValueError(f"❌ Index '{index_name}' holds {store.index.d}-d vectors, "
+                         f"{provider}/{model} produces {expected}-d.")
+
+def reindex(store, embeddings, kind):
+    """Move every vector of the store into a freshly trained index of `kind`."""
+    n = store.index.ntotal
+    vectors = stored_vectors(store.index)
+    if vectors is None:  # IVF/PQ keep no exact copy; re-embed (served by the embedding cache)
+        texts = [store.docstore.search(store.index_to_docstore_id[i]).page_content for i in range(n)]
+        vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = build_index(kind, vectors)
+    index.add(vectors)
+    print(f"🧱 Re-indexed {n} vectors: {index_kind(store.index)} -> {index_kind(index)}.")
+    store.index = index
+    return store
+
+def _due_for_reindex(store, kind):
+    n = store.index.ntotal
+    return index_kind(store.index) != kind and n >= min_training_points(kind, FAISS_NLIST or default_nlist(n))
+
+def save_store(store, index_name, embeddings):
+    kind = index_type_for(index_name)
+    if _due_for_reindex(store, kind):
+        reindex(store, embeddings, kind)
+    store.save_local(FAISS_DIR, index_name=index_name)
+    provider, model, _ = _describe(embeddings)
+    with open(_meta_path(index_name), "w", encoding="utf-8") as f:
+        json.dump({"provider": provider, "model": model, "dim": store.index.d,
+                   "index_type": index_kind(store.index)}, f, indent=2)
+
+def content_hash(text):
+    normalized = re.sub(r"\s+", " ", text or "").strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+def load_store(index_name="index", embeddings=None):
+    """Load a saved index, or return None if it has not been built yet."""
+    if not os.path.exists(os.path.join(FAISS_DIR, f"{index_name}.faiss")):
+        return None
+    embeddings = embeddings or embeddings_for(index_name)
+    store = FAISS.load_local(FAISS_DIR, embeddings, index_name=index_name,
+                             allow_dangerous_deserialization=True)
+    check_compatible(index_name, store, embeddings)
+    tune(store.index)
+    return store
+
+def indexed_ids(store):
+    """Content hashes already in the store (docs added before hashing are hashed on load)."""
+    if store is None:
+        return set()
+    ids = set(store.index_to_docstore_id.values())
+    for doc in store.docstore._dict.values():
+        ids.add(doc.metadata.get("content_hash") or content_hash(doc.page_content))
+    return ids
+
+def add_new_documents(docs, index_name="index", embeddings=None, store=None, save=True, known=None):
+    """Embed and add only documents whose content hash is not indexed yet.
+
+    Returns (store, number_added); the store is created on first use. Callers adding
+    many batches pass `store` and a `known` set (from indexed_ids) to avoid rescanning,
+    and save=False to write the index once at the end.
+    """
+    embeddings = embeddings or embeddings_for(index_name)
+    if store is None:
+        store = load_store(index_name, embeddings)
+    if known is None:
+        known = indexed_ids(store)
+    new_docs, new_ids = [], []
+    for doc in docs:
+        doc_id = doc.metadata.get("content_hash") or content_hash(doc.page_content)
+        if doc_id in known:
+            continue
+        known.add(doc_id)
+        doc.metadata["content_hash"] = doc_id
+        new_docs.append(doc)
+        new_ids.append(doc_id)
+    if new_docs:
+        if store is None:
+            store = FAISS.from_documents(new_docs, embeddings, ids=new_ids)
+        else:
+            store.add_documents(new_docs, ids=new_ids)
+        if save:
+            save_store(store, index_name, embeddings)
+    return store, len(new_docs)
+
+
+if __name__ == "__main__":
+    # python vector_store.py reindex <index_name> [flat|ivf|hnsw|ivfpq]   (retrain, e.g. after the corpus grew)
+    import sys
+
+    if len(sys.argv) < 3 or sys.argv[1] != "reindex":
+        raise SystemExit("Usage: python vector_store.py reindex <index_name> [flat|ivf|hnsw|ivfpq]")
+    name = sys.argv[2]
+    if len(sys.argv) > 3:
+        os.environ[f"FAISS_INDEX_TYPE_{name.upper()}"] = sys.argv[3]
+    embeddings = embeddings_for(name)
+    store = load_store(name, embeddings)
+    if store is None:
+        raise SystemExit(f"❌ Index '{name}' has not been built yet.")
+    reindex(store, embeddings, index_type_for(name))
+    save_store(store, name, embeddings)